@@ -12,13 +12,19 @@ import time
 import hmac
 import urllib.parse
 import random
+import queue
+import threading
 from collections import deque
 from datetime import datetime, timedelta
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 from email.mime.application import MIMEApplication
 import sqlite3
-from solver import create_timetable
+from solver import (
+    create_timetable, explain_infeasibility, SOLVER_PROFILES, DEFAULT_SOLVER_PROFILE, BLOCK_MODELS, DEFAULT_BLOCK_MODEL,
+    available_cpu_count,
+)
+from problem import get_problem, parse_slot
 
 try:
     from fpdf import FPDF
@@ -188,6 +194,8 @@ def save_data():
         "report_config": st.session_state.get('report_config', {}),
         "email_config": st.session_state.get('email_config', {}),
         "last_schedule": st.session_state.get('last_schedule', []),
+        "last_schedule_draft": st.session_state.get('last_schedule_draft', False),
+        "pinned_lessons": st.session_state.get('pinned_lessons', []),
         "duty_places": st.session_state.get('duty_places', []),
         "duty_place_constraints": st.session_state.get('duty_place_constraints', {}),
         "duty_place_branch_constraints": st.session_state.get('duty_place_branch_constraints', {}),
@@ -220,6 +228,38 @@ def save_data():
     except Exception as e:
         st.error(f"Veritabanı kayıt hatası: {e}")
 
+def get_school_problem():
+    """
+    Oturumdaki okul verisinin ProblemModel'i (veri değişmedikçe önbellekten gelir).
+    Çözücü ve arayüzün okul verisinden türettiği değerler (öğretmen yükü/kapasitesi, ders özellikleri, derslik
+    uygunluğu) bu modelden okunur. Düzenleme tabloları ham veriyi gösterip kaydeder (bkz. format_duty_days).
+    """
+    lunch_val = st.session_state.lesson_config.get("lunch_break_hour", "Yok")
+    return get_problem(
+        st.session_state.teachers, st.session_state.courses, st.session_state.classes,
+        st.session_state.class_lessons, st.session_state.assignments, st.session_state.rooms,
+        room_capacities=st.session_state.room_capacities,
+        room_branches={k: (v if v is not None else []) for k, v in st.session_state.room_branches.items()},
+        room_teachers={k: (v if v is not None else []) for k, v in st.session_state.room_teachers.items()},
+        room_courses={k: (v if v is not None else []) for k, v in st.session_state.room_courses.items()},
+        room_excluded_courses={k: (v if v is not None else []) for k, v in st.session_state.get('room_excluded_courses', {}).items()},
+        lunch_break_hour=int(lunch_val) if lunch_val not in (None, "Yok") else None,
+        num_hours=st.session_state.lesson_config.get("num_hours", 8)
+    )
+
+def format_duty_days(x):
+    """Nöbet günleri listesini düzenleme tablosu için metne çevirir ("Pazartesi, Cuma")."""
+    if isinstance(x, list): return ", ".join(x)
+    if pd.isna(x) or x == "Yok": return ""
+    return str(x)
+
+def parse_duty_days(x):
+    """Düzenleme tablosundaki nöbet günleri metnini listeye geri çevirir."""
+    if not x: return []
+    if isinstance(x, str):
+        return [d.strip() for d in x.split(",") if d.strip()]
+    return []
+
 def search_teacher_by_name(name_query):
     """
     SQLite JSON özelliklerini kullanarak veritabanından isme göre öğretmen arar.
@@ -1094,7 +1134,9 @@ if 'lesson_config' not in st.session_state:
         "lunch_duration": 50,
         "num_hours": 8,
         "lunch_break_hour": "Yok",
-        "min_daily_hours": 2
+        "min_daily_hours": 2,
+        "solver_profile": DEFAULT_SOLVER_PROFILE,
+        "block_model": DEFAULT_BLOCK_MODEL
     })
 if 'simultaneous_lessons' not in st.session_state:
     st.session_state.simultaneous_lessons = saved_data.get('simultaneous_lessons', {})
@@ -1115,6 +1157,10 @@ if 'email_config' not in st.session_state:
     })
 if 'last_schedule' not in st.session_state:
     st.session_state.last_schedule = saved_data.get('last_schedule', [])
+if 'last_schedule_draft' not in st.session_state:
+    st.session_state.last_schedule_draft = saved_data.get('last_schedule_draft', False)
+if 'pinned_lessons' not in st.session_state:
+    st.session_state.pinned_lessons = saved_data.get('pinned_lessons', [])
 if 'duty_places' not in st.session_state:
     st.session_state.duty_places = saved_data.get('duty_places', ["Bahçe", "Zemin Kat", "1. Kat", "2. Kat", "Kantin"])
 if 'duty_place_constraints' not in st.session_state:
@@ -1275,6 +1321,22 @@ if menu == "Tanımlamalar":
                 st.success(f"{selected_room} için kısıtlamalar güncellendi!")
                 st.rerun()
 
+            # --- Uygunluk Matrisi (Çözücünün kullandığı matrisin aynısı) ---
+            with st.expander("📋 Derslik Uygunluk Matrisi (Ders - Öğretmen / Derslik)", expanded=False):
+                st.caption("Program oluşturulurken çözücü bu matrisi kullanır. ✔ işaretli derslikler ilgili ders-öğretmen çifti için uygundur.")
+                matrix_mode = st.radio("Dağıtım Modu", ["Sınıf Bazlı", "Derslik Bazlı"], horizontal=True, key="eligibility_matrix_mode")
+                eligibility = get_school_problem().eligibility("room" if "Derslik" in matrix_mode else "class")
+                matrix_rows = eligibility.matrix()
+                if matrix_rows:
+                    df_matrix = pd.DataFrame(matrix_rows).set_index(["Ders", "Öğretmen"])
+                    df_matrix = df_matrix.replace({True: "✔", False: ""})
+                    st.dataframe(df_matrix, width="stretch")
+                    no_room = [f"{crs} - {t}" for (crs, t), m in eligibility.masks.items() if not m]
+                    if no_room:
+                        st.warning(f"⚠️ Uygun dersliği olmayan (programa yerleşemeyecek) dersler: {', '.join(no_room)}")
+                else:
+                    st.info("Henüz öğretmen atanmış ders bulunmuyor.")
+
     with tab3: # Öğretmenler
         st.info("Öğretmen bilgilerini tablodan düzenleyebilirsiniz.")
         col_t1, col_t2 = st.columns([3, 1])
@@ -1311,11 +1373,7 @@ if menu == "Tanımlamalar":
             
             # 2. duty_day (TextColumn olduğu için stringe çeviriyoruz, kaydederken geri çevireceğiz)
             if "duty_day" in df_teachers.columns:
-                def fmt_duty(x):
-                    if isinstance(x, list): return ", ".join(x)
-                    if pd.isna(x) or x == "Yok": return ""
-                    return str(x)
-                df_teachers["duty_day"] = df_teachers["duty_day"].apply(fmt_duty)
+                df_teachers["duty_day"] = df_teachers["duty_day"].apply(format_duty_days)
             
         df_filtered_teachers = df_teachers
         if filter_branch != "Tümü":
@@ -1366,12 +1424,7 @@ if menu == "Tanımlamalar":
             
             # duty_day string'den listeye geri çevir
             if "duty_day" in cleaned_df.columns:
-                def parse_duty(x):
-                    if not x: return []
-                    if isinstance(x, str):
-                        return [d.strip() for d in x.split(",") if d.strip()]
-                    return []
-                cleaned_df["duty_day"] = cleaned_df["duty_day"].apply(parse_duty)
+                cleaned_df["duty_day"] = cleaned_df["duty_day"].apply(parse_duty_days)
             
             st.session_state.teachers = cleaned_df.where(pd.notnull(cleaned_df), None).to_dict("records")
             save_data()
@@ -1392,7 +1445,7 @@ if menu == "Tanımlamalar":
             
             if sel_t:
                 days = ["Pazartesi", "Salı", "Çarşamba", "Perşembe", "Cuma"]
-                current_slots = sel_t.get("unavailable_slots", []) or []
+                current_slots = {parse_slot(slot) for slot in sel_t.get("unavailable_slots", []) or []}
                 current_days = sel_t.get("unavailable_days", []) or []
                 
                 # İzinli Günler Seçimi
@@ -1406,9 +1459,8 @@ if menu == "Tanımlamalar":
                 for h in range(1, num_hours_cfg + 1):
                     row = {"Saat": f"{h}. Ders"}
                     for d in days:
-                        key = f"{d}:{h}"
                         # Gün izinliyse veya saat kısıtlıysa işaretle
-                        is_unavailable = (key in current_slots) or (d in new_days)
+                        is_unavailable = ((d, h) in current_slots) or (d in new_days)
                         row[d] = is_unavailable
                     grid_data.append(row)
                 
@@ -1549,13 +1601,11 @@ if menu == "Tanımlamalar":
 elif menu == "Ders Atama & Kopyalama":
     st.header("Sınıf Ders ve Öğretmen Atamaları")
     
-    # Öğretmen ders yüklerini hesapla (Seçim ekranında göstermek için)
-    teacher_loads = {t['name']: 0 for t in st.session_state.teachers}
-    for c_name, courses in st.session_state.class_lessons.items():
-        for crs_name, hours in courses.items():
-            t_name = st.session_state.assignments.get(c_name, {}).get(crs_name)
-            if t_name in teacher_loads:
-                teacher_loads[t_name] += hours
+    # Öğretmen ders yükleri (Seçim ekranında göstermek için, çözücüyle aynı modelden)
+    school_problem = get_school_problem()
+    teacher_loads = {
+        t['name']: school_problem.teacher_props(t['name'])["load"] for t in st.session_state.teachers if t.get('name')
+    }
 
     col1, col2 = st.columns([2, 1])
 
@@ -1592,8 +1642,8 @@ elif menu == "Ders Atama & Kopyalama":
         f_course = st.selectbox("Ders Seç", [c['name'] for c in st.session_state.courses])
         
         # Seçilen derse göre branşı ve öğretmenleri bul
-        course_branch = next((c['branch'] for c in st.session_state.courses if c['name'] == f_course), None)
-        filtered_teachers = [t['name'] for t in st.session_state.teachers if t['branch'] == course_branch]
+        course_branch = school_problem.course_props(f_course)["branch"] if f_course else None
+        filtered_teachers = [t['name'] for t in st.session_state.teachers if str(t.get('branch') or "").strip() == course_branch]
         
         # Öğretmen seçimini form dışına alarak anlık yük gösterimi sağlıyoruz
         f_teacher = st.selectbox(
@@ -1829,9 +1879,9 @@ elif menu == "Ders Atama & Kopyalama":
                     if st.session_state.assignments.get(c_key, {}).get(crs_key) == t_name:
                         assigned_classes.add(c_key)
             
-            max_daily = int(t.get('max_hours_per_day', 8))
-            unavailable = t.get('unavailable_days') or []
-            weekly_cap = (5 - len(unavailable)) * max_daily
+            max_daily = school_problem.teacher_props(t_name)["max_hours_per_day"]
+            # Kapalı saatler, öğle arası ve günlük limit birlikte gözetilir
+            weekly_cap = school_problem.teacher_weekly_capacity(t_name)
             occupancy = total_hours / weekly_cap if weekly_cap > 0 else 0
             
             status = "✅"
@@ -2040,6 +2090,23 @@ elif menu == "Program Oluştur":
             # duty_reduction = col_dr1.slider("Nöbet Günü Ders Yükü Azaltma (Saat)", min_value=0, max_value=8, value=int(lc.get("duty_day_reduction", 2)), help="Öğretmenin nöbetçi olduğu gün, günlük maksimum ders saatinden kaç saat daha az ders verileceğini belirler.")
             min_daily = st.slider("Öğretmen Günlük Min. Ders (Geldiği Gün)", min_value=1, max_value=5, value=int(lc.get("min_daily_hours", 2)), help="Öğretmen okula geldiği gün en az kaç saat dersi olsun?")
 
+            profile_keys = list(SOLVER_PROFILES)
+            curr_profile = lc.get("solver_profile", DEFAULT_SOLVER_PROFILE)
+            if curr_profile not in profile_keys: curr_profile = DEFAULT_SOLVER_PROFILE
+            new_profile = st.selectbox(
+                "Çözücü Profili", profile_keys, index=profile_keys.index(curr_profile),
+                format_func=lambda k: f"{SOLVER_PROFILES[k]['label']} - en fazla {SOLVER_PROFILES[k]['time_limit']:.0f} sn",
+                help=f"Taslak: Hızlı, yaklaşık sonuç. Dengeli: Günlük kullanım. Kapsamlı: Daha uzun arama, daha iyi program. Paralel arama bu sunucudaki {available_cpu_count()} çekirdeğe göre ayarlanır."
+            )
+
+            block_keys = list(BLOCK_MODELS)
+            curr_block = lc.get("block_model", DEFAULT_BLOCK_MODEL)
+            if curr_block not in block_keys: curr_block = DEFAULT_BLOCK_MODEL
+            new_block_model = st.selectbox(
+                "Blok Ders Modeli", block_keys, index=block_keys.index(curr_block), format_func=lambda k: BLOCK_MODELS[k],
+                help="Blok Başlangıç Modeli: Blok dersin başlangıç saati ve süresi doğrudan seçilir (daha az yardımcı değişken, blok tek derslikte). Saatlik Model: Her saat ayrı seçilir, süreklilik ek değişkenlerle sağlanır."
+            )
+
             st.session_state.lesson_config = {
                 "start_time": new_start,
                 "lesson_duration": new_ldur,
@@ -2047,7 +2114,9 @@ elif menu == "Program Oluştur":
                 "lunch_duration": new_lunch_dur,
                 "num_hours": new_num_hours,
                 "lunch_break_hour": new_lunch_hour,
-                "min_daily_hours": min_daily
+                "min_daily_hours": min_daily,
+                "solver_profile": new_profile,
+                "block_model": new_block_model
             }
         
         with st.expander("Rapor Ayarları (İmza ve Metinler)", expanded=False):
@@ -2084,27 +2153,122 @@ elif menu == "Program Oluştur":
             }
         
         mode = st.radio("Mod:", ["Sınıf Bazlı", "Derslik Bazlı"])
+        room_engine_label = "Birleşik Model"
+        if "Derslik" in mode:
+            room_engine_label = st.radio("Derslik Çözüm Yöntemi:", ["Birleşik Model", "İki Aşamalı (Önce Saat, Sonra Derslik)"], help="İki aşamalı yöntem büyük okullarda çok daha hızlıdır: Önce dersler saatlere yerleştirilir, sonra derslikler her saat için eşleştirilir. Derslik ataması tamamlanamazsa otomatik olarak birleşik modele geçilir.")
     else:
         mode = "Sınıf Bazlı"
+        room_engine_label = "Birleşik Model"
 
     solver_mode = "room" if "Derslik" in mode else "class"
+    room_engine = "two_phase" if "İki Aşamalı" in room_engine_label else "joint"
     
     # Değerleri config'den al
     num_hours = st.session_state.lesson_config.get("num_hours", 8)
     lunch_val = st.session_state.lesson_config.get("lunch_break_hour", "Yok")
     lunch_break_hour = int(lunch_val) if lunch_val != "Yok" else None
 
-    if st.session_state.role == "admin" and st.button("Programı Dağıt"):
+    repair_mode = False
+    repair_teachers, repair_classes = [], []
+    if st.session_state.role == "admin" and st.session_state.get('last_schedule'):
+        repair_mode = st.checkbox("Sadece değişen kısmı yeniden çöz (Onarım)", help="Mevcut programdaki dersler korunur; sadece değişiklikten etkilenen dersler (geçersiz kalan yerleşimler, seçilen öğretmen/sınıfların dersleri ve onlarla çakışabilecek dersler) yeniden yerleştirilir. Gerekirse etkilenen bölge otomatik olarak genişletilir.")
+        if repair_mode:
+            r_col1, r_col2 = st.columns(2)
+            repair_teachers = r_col1.multiselect("Değişen Öğretmenler (İsteğe bağlı)", sorted(t['name'] for t in st.session_state.teachers if t.get('name')))
+            repair_classes = r_col2.multiselect("Değişen Sınıflar (İsteğe bağlı)", st.session_state.classes)
+
+    preview_class = None
+    objective_mode = "weighted"
+    draft_mode = False
+    precheck = True
+    if st.session_state.role == "admin":
+        draft_mode = st.checkbox("📝 Taslak Mod (Hızlı sığma kontrolü)", help="Sadece kesin kurallar uygulanır (çakışma, müsaitlik, blok dersler, derslik kapasitesi); tercihler, günlük limitler ve denge kuralları gözetilmez. Tüm dersler yerleşince arama hemen durur. Atamaları denerken programın sığıp sığmadığını hızlıca görmek için kullanın.")
+        if st.checkbox("Aşamalı Amaç (Önce yerleşim, sonra kurallar)", help="Önce yerleşen ders saati maksimize edilir ve sabitlenir; ardından öğretmen günlük limit, ders günlük limit ve tercih ihlalleri sırayla en aza indirilir. Sonuç mesajında hangi aşamanın kanıtlanmış optimum olduğu gösterilir."):
+            objective_mode = "lexicographic"
+        if st.checkbox("Ön kontrol sorun bulursa dağıtma", help="Dağıtımdan önce öğretmen/sınıf kapasitesi, derslik kapasitesi ve blok dersler hızlıca kontrol edilir. Normalde sorunlar sonuçta uyarı olarak gösterilir ve yerleşebilen en fazla dersle program oluşturulur. İşaretlenirse tüm derslerin yerleşmesi imkansız olduğunda çözücü hiç çalıştırılmadan sadece sorunlar gösterilir."):
+            precheck = "strict"
+        preview_class = st.selectbox("Canlı Önizleme Sınıfı", ["(Önizleme yok)"] + list(st.session_state.classes), help="Arama sürerken bulunan en iyi ara çözümde bu sınıfın programı gösterilir.")
+        if preview_class == "(Önizleme yok)": preview_class = None
+
+    # Arama sürerken "Durdur" butonu sayfayı yeniden çalıştırır; devam eden arama (solve_job) kaldığı yerden izlenir.
+    if st.session_state.role == "admin" and (st.button("Programı Dağıt") or st.session_state.get('solve_job')):
+        previous_schedule = st.session_state.get('last_schedule') or [] # Çözücüye başlangıç ipucu olarak verilir
         st.session_state.last_schedule = [] # Yeni işlem öncesi eski sonucu temizle
         
         # İlerleme Çubuğu Oluştur
         prog_bar = st.progress(0)
         status_text = st.empty()
+        live_metrics = st.empty()
+        live_preview = st.empty()
         
         def update_progress(pct, msg):
             prog_bar.progress(pct)
             status_text.text(msg)
 
+        def show_incumbent(info):
+            # Arama sırasında bulunan en iyi ara çözüm (canlı)
+            with live_metrics.container():
+                m1, m2, m3, m4 = st.columns(4)
+                m1.metric("Bulunan Çözüm", info["solution"], help=f"{info['time']:.1f} sn")
+                m2.metric("Eksik Ders Saati", info["missing_hours"])
+                m3.metric("İhlal Edilen Kural", info["violations"])
+                m4.metric("Amaç / Sınır", f"{info['objective']:,.0f}", delta=f"{info['objective'] - info['bound']:,.0f}", delta_color="off")
+            if preview_class:
+                df_inc = pd.DataFrame([item for item in info["schedule"]() if item["Sınıf"] == preview_class])
+                if not df_inc.empty:
+                    df_inc = df_inc.assign(Hucre=df_inc["Ders"] + " (" + df_inc["Öğretmen"] + ")")
+                    pivot = df_inc.pivot_table(index="Saat", columns="Gün", values="Hucre", aggfunc=" / ".join)
+                    pivot = pivot.reindex(columns=["Pazartesi", "Salı", "Çarşamba", "Perşembe", "Cuma"], index=range(1, num_hours + 1)).fillna("")
+                    live_preview.dataframe(pivot, width="stretch")
+
+        def run_solver_live(**kwargs):
+            """
+            Çözücüyü arka planda çalıştırır; ilerleme ve ara çözümler kuyruk üzerinden bu (arayüz) iş parçacığında gösterilir.
+            (Streamlit bileşenleri sadece sayfanın kendi iş parçacığından güncellenebilir.)
+            Arama session_state.solve_job içinde tutulur: "Durdur" ile sayfa yeniden çalıştığında aynı arama izlenmeye devam eder.
+            """
+            job = st.session_state.get('solve_job')
+            if job is None:
+                job = {"events": queue.Queue(), "box": {}, "stop": threading.Event(), "started": time.time()}
+
+                def work():
+                    try:
+                        job["box"]["result"] = create_timetable(
+                            **kwargs,
+                            progress_callback=lambda pct, msg: job["events"].put(("progress", (pct, msg))),
+                            incumbent_callback=lambda info: job["events"].put(("incumbent", info)),
+                            stop_event=job["stop"]
+                        )
+                    except Exception as e:
+                        job["box"]["error"] = e
+
+                job["thread"] = threading.Thread(target=work, daemon=True)
+                st.session_state.solve_job = job
+                job["thread"].start()
+
+            if st.button("⏹ Aramayı Durdur (En İyi Çözümü Kullan)", key="btn_stop_solve"):
+                job["stop"].set()
+            if job["stop"].is_set():
+                st.info("Arama durduruluyor, bulunan en iyi program hazırlanıyor...")
+
+            events = job["events"]
+            while job["thread"].is_alive() or not events.empty():
+                try:
+                    kind, payload = events.get(timeout=0.5)
+                except queue.Empty:
+                    # Bekleme sırasında da arayüzü güncelle (Streamlit durdurma/yeniden çalıştırma isteklerini burada işler)
+                    prog_bar.progress(90)
+                    status_text.text(f"Çözüm aranıyor... ({time.time() - job['started']:.0f} sn)")
+                    continue
+                if kind == "progress":
+                    update_progress(*payload)
+                elif events.empty(): # Sırada daha yeni bir çözüm varsa ara adımı atla
+                    show_incumbent(payload)
+            prog_bar.progress(100) # Sayfa bu noktada yeniden çalıştırılırsa arama sonucu solve_job'da kalır
+            del st.session_state.solve_job
+            if "error" in job["box"]: raise job["box"]["error"]
+            return job["box"]["result"]
+
         # Veri temizliği: None olan listeleri boş listeye çevir (TypeError önlemek için)
         clean_room_branches = {k: (v if v is not None else []) for k, v in st.session_state.room_branches.items()}
         clean_room_teachers = {k: (v if v is not None else []) for k, v in st.session_state.room_teachers.items()}
@@ -2112,9 +2276,9 @@ elif menu == "Program Oluştur":
         clean_room_excluded = {k: (v if v is not None else []) for k, v in st.session_state.get('room_excluded_courses', {}).items()}
 
         try:
-            schedule, msg, violations = create_timetable(
-                st.session_state.teachers, st.session_state.courses, st.session_state.classes,
-                st.session_state.class_lessons, st.session_state.assignments, st.session_state.rooms, 
+            schedule, msg, violations = run_solver_live(
+                teachers=st.session_state.teachers, courses=st.session_state.courses, classes=st.session_state.classes,
+                class_lessons=st.session_state.class_lessons, assignments=st.session_state.assignments, rooms=st.session_state.rooms,
                 room_capacities=st.session_state.room_capacities,
                 room_branches=clean_room_branches,
                 room_teachers=clean_room_teachers,
@@ -2123,7 +2287,18 @@ elif menu == "Program Oluştur":
                 mode=solver_mode, lunch_break_hour=lunch_break_hour, num_hours=num_hours,
                 simultaneous_lessons=st.session_state.simultaneous_lessons,
                 min_daily_hours=st.session_state.lesson_config.get("min_daily_hours", 2),
-                progress_callback=update_progress
+                room_engine=room_engine,
+                problem=get_school_problem(),
+                hint_schedule=previous_schedule,
+                repair_schedule=previous_schedule if repair_mode else None,
+                repair_teachers=repair_teachers,
+                repair_classes=repair_classes,
+                pinned_lessons=st.session_state.get('pinned_lessons', []),
+                solver_profile=st.session_state.lesson_config.get("solver_profile", DEFAULT_SOLVER_PROFILE),
+                objective_mode=objective_mode,
+                draft=draft_mode,
+                precheck=precheck,
+                block_model=st.session_state.lesson_config.get("block_model", DEFAULT_BLOCK_MODEL)
             )
         except TypeError as e:
             if "unexpected keyword argument" in str(e):
@@ -2160,9 +2335,12 @@ elif menu == "Program Oluştur":
         
         prog_bar.empty()
         status_text.empty()
+        live_metrics.empty()
+        live_preview.empty()
         
         if schedule:
             st.session_state.last_schedule = schedule
+            st.session_state.last_schedule_draft = draft_mode
             save_data()
             st.success(msg)
             
@@ -2188,9 +2366,31 @@ elif menu == "Program Oluştur":
         else:
             st.error(msg)
 
+    # Açıklama Modu: Tüm derslerin yerleşmesine engel olan en küçük kural kümesi (tek tanı çalıştırması)
+    if st.session_state.role == "admin" and st.button("🔍 Neden Sığmıyor? (Çakışan Kuralları Açıkla)", help="Tüm derslerin tam yerleşmesi zorunlu tutulur; öğretmen izinleri, günlük limitler, blok süreleri, derslik grupları gibi kurallardan hangilerinin birlikte sağlanamadığı bulunur. Kısıtları deneme yanılma ile gevşetmek yerine önce bunu çalıştırın."):
+        explain_bar = st.progress(0)
+        explain_text = st.empty()
+
+        def explain_progress(percent, message):
+            explain_bar.progress(percent)
+            explain_text.text(message)
+
+        core, explain_msg = explain_infeasibility(
+            get_school_problem(), mode=solver_mode, simultaneous_lessons=st.session_state.simultaneous_lessons,
+            progress_callback=explain_progress
+        )
+        explain_bar.empty()
+        explain_text.empty()
+        if core:
+            st.error(explain_msg)
+        else:
+            st.info(explain_msg)
+
     # Programı göster (Buton bloğunun dışında, session_state'den)
     if 'last_schedule' in st.session_state and st.session_state.last_schedule:
         schedule = st.session_state.last_schedule
+        if st.session_state.get('last_schedule_draft'):
+            st.warning("📝 **TASLAK PROGRAM** - Sadece kesin kurallarla oluşturuldu; öğretmen tercihleri, günlük limitler ve denge kuralları gözetilmedi. Kesin program için Taslak Mod kapalıyken yeniden dağıtın.")
         df = pd.DataFrame(schedule)
         
         # Çakışma Kontrolü
@@ -2367,6 +2567,35 @@ elif menu == "Program Oluştur":
                     key=f"manual_schedule_editor_{edit_teacher}"
                 )
                 
+                # 4. Sabitleme: Seçilen hücreler "Programı Dağıt" sırasında yerinde kalır
+                def pin_key(it):
+                    return (it.get("Sınıf"), it.get("Ders"), it.get("Gün"), it.get("Saat"))
+
+                def pin_label(it):
+                    room_txt = f" ({it['Derslik']})" if it.get("Derslik") else ""
+                    return f"{it['Gün']} {it['Saat']}. Saat: {it['Sınıf']} - {it['Ders']}{room_txt}"
+
+                teacher_cells = sorted(
+                    [item for item in current_schedule if item["Öğretmen"] == edit_teacher],
+                    key=lambda it: (days.index(it["Gün"]) if it["Gün"] in days else len(days), it["Saat"])
+                )
+                pinned_keys = {pin_key(p) for p in st.session_state.pinned_lessons}
+                pin_selection = st.multiselect(
+                    "🔒 Sabitlenen Dersler",
+                    options=[pin_label(it) for it in teacher_cells],
+                    default=[pin_label(it) for it in teacher_cells if pin_key(it) in pinned_keys],
+                    key=f"pin_select_{edit_teacher}",
+                    help="Sabitlenen dersler program yeniden dağıtıldığında aynı gün, saat ve derslikte kalır."
+                )
+                if st.button("Sabitlemeleri Kaydet", key="btn_save_pins"):
+                    other_pins = [p for p in st.session_state.pinned_lessons if p.get("Öğretmen") != edit_teacher]
+                    st.session_state.pinned_lessons = other_pins + [
+                        {k: it.get(k) for k in ("Sınıf", "Ders", "Öğretmen", "Derslik", "Gün", "Saat")}
+                        for it in teacher_cells if pin_label(it) in pin_selection
+                    ]
+                    save_data()
+                    st.success(f"{edit_teacher} için {len(st.session_state.pinned_lessons) - len(other_pins)} ders sabitlendi.")
+
                 if st.button("Manuel Değişiklikleri Kaydet", key="btn_save_manual_edit"):
                     # Oda bilgisini sakla
                     room_map = {}
@@ -2388,8 +2617,8 @@ elif menu == "Program Oluştur":
                                 c_name, crs_name = val.split(" - ", 1)
                                 room = room_map.get((c_name, crs_name))
                                 if not room:
-                                    course_cfg = next((c for c in st.session_state.courses if c["name"] == crs_name), None)
-                                    if course_cfg: room = course_cfg.get("specific_room")
+                                    # Etiketli dersler (Örn: "Mat (Grup A)") ana dersin zorunlu dersliğini kullanır
+                                    room = get_school_problem().course_props(crs_name)["specific_room"]
                                 
                                 proposed_teacher_schedule.append({
                                     "Sınıf": c_name,
@@ -2417,6 +2646,12 @@ elif menu == "Program Oluştur":
                     else:
                         # Kaydet
                         st.session_state.last_schedule = other_teachers_schedule + proposed_teacher_schedule
+                        # Yeri değişen hücrelerin sabitlemesi kaldırılır
+                        new_keys = {pin_key(it) for it in proposed_teacher_schedule}
+                        st.session_state.pinned_lessons = [
+                            p for p in st.session_state.pinned_lessons
+                            if p.get("Öğretmen") != edit_teacher or pin_key(p) in new_keys
+                        ]
                         save_data()
                         st.success(f"{edit_teacher} için program güncellendi!")
                         st.rerun()
@@ -3323,11 +3558,7 @@ elif menu == "Hızlı Düzenle":
         
         # duty_day'i string'e çevir (Çoklu gün desteği için TextColumn kullanacağız)
         if "duty_day" in df_teachers_fast.columns:
-            def fmt_duty(x):
-                if isinstance(x, list): return ", ".join(x)
-                if pd.isna(x) or x == "Yok": return ""
-                return str(x)
-            df_teachers_fast["duty_day"] = df_teachers_fast["duty_day"].apply(fmt_duty)
+            df_teachers_fast["duty_day"] = df_teachers_fast["duty_day"].apply(format_duty_days)
 
         new_df = st.data_editor(
             df_teachers_fast,
@@ -3365,12 +3596,7 @@ elif menu == "Hızlı Düzenle":
             # Kaydederken duty_day'i tekrar listeye çevir
             cleaned_df = new_df.copy()
             if "duty_day" in cleaned_df.columns:
-                def parse_duty(x):
-                    if not x: return []
-                    if isinstance(x, str):
-                        return [d.strip() for d in x.split(",") if d.strip()]
-                    return []
-                cleaned_df["duty_day"] = cleaned_df["duty_day"].apply(parse_duty)
+                cleaned_df["duty_day"] = cleaned_df["duty_day"].apply(parse_duty_days)
             
             st.session_state.teachers = cleaned_df.where(pd.notnull(cleaned_df), None).to_dict('records')
             save_data()
@@ -0,0 +1,93 @@
+"""
+Model kurulum süresi ve bellek ölçümü (çözüm aşamasına geçilmeden).
+
+Kullanım:
+    python benchmark.py [veri.json] [--scale N]
+
+--scale N: Sınıfları N kez çoğaltarak büyük okul senaryosu oluşturur (9-A -> 9-A#2, ...).
+Her senaryo için yalın (lean_build) ve eski kurulum yolu, isimli ve isimsiz değişkenlerle ölçülür.
+"""
+import argparse
+import json
+import time
+import tracemalloc
+
+from solver import create_timetable
+
+
+class _BuildDone(Exception):
+    """Model kurulduğunda (çözüm başlamadan) ölçümü kesmek için."""
+
+
+def load_school(path, scale=1):
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    if scale > 1:
+        classes = list(data["classes"])
+        for i in range(2, scale + 1):
+            for c_name in classes:
+                copy_name = f"{c_name}#{i}"
+                data["classes"].append(copy_name)
+                data["class_lessons"][copy_name] = dict(data["class_lessons"].get(c_name, {}))
+                data["assignments"][copy_name] = dict(data["assignments"].get(c_name, {}))
+    return data
+
+
+def _build(data, mode, **options):
+    lc = data.get("lesson_config", {})
+    lunch = lc.get("lunch_break_hour")
+    lunch = int(lunch) if lunch not in (None, "Yok") else None
+
+    def on_progress(pct, msg):
+        if pct >= 90:
+            raise _BuildDone()
+
+    try:
+        create_timetable(
+            data["teachers"], data["courses"], data["classes"], data["class_lessons"], data["assignments"], data["rooms"],
+            room_capacities=data.get("room_capacities"), room_branches=data.get("room_branches"),
+            room_teachers=data.get("room_teachers"), room_courses=data.get("room_courses"),
+            room_excluded_courses=data.get("room_excluded_courses"), mode=mode, lunch_break_hour=lunch,
+            num_hours=int(lc.get("num_hours", 8)), simultaneous_lessons=data.get("simultaneous_lessons"),
+            min_daily_hours=lc.get("min_daily_hours", 2), progress_callback=on_progress, precheck=False,
+            decompose=False, hierarchical=False, portfolio=1, **options
+        )
+    except _BuildDone:
+        pass
+
+
+def measure_build(data, mode, **options):
+    """Model kurulumunu ölçer, (süre sn, Python bellek tepe MB) döndürür.
+    Süre ve bellek ayrı çalıştırmalarda ölçülür (tracemalloc süreyi yavaşlatır)."""
+    start = time.perf_counter()
+    _build(data, mode, **options)
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    _build(data, mode, **options)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / (1024 * 1024)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Model kurulum performans ölçümü")
+    parser.add_argument("data", nargs="?", default="okul_verileri.json")
+    parser.add_argument("--scale", type=int, default=1)
+    args = parser.parse_args()
+
+    data = load_school(args.data, args.scale)
+    variants = [
+        ("eski", {"lean_build": False, "name_variables": True}),
+        ("yalın", {"lean_build": True, "name_variables": True}),
+        ("yalın+isimsiz", {"lean_build": True, "name_variables": False}),
+    ]
+    print(f"Sınıf sayısı: {len(data['classes'])}")
+    for mode in ["class", "room"]:
+        for label, options in variants:
+            elapsed, peak = measure_build(data, mode, **options)
+            print(f"{mode:<6} {label:<14} kurulum: {elapsed:7.3f} sn   bellek (tepe): {peak:8.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,392 @@
+"""
+Normalleştirilmiş problem modeli.
+
+Okul verisi (öğretmenler, dersler, sınıflar, derslikler, atamalar) bir veri sürümü için bir kez
+temizlenir: İsimler tamsayı kimliklere çevrilir, "Gün:Saat" kısıtları bit maskelerine dönüştürülür,
+etiketli derslerin ("Matematik (Grup A)") özellikleri ana dersten önceden çözümlenir.
+Çözücü (create_timetable) ve arayüz sayfaları aynı modeli kullanır.
+"""
+import hashlib
+import json
+from collections import OrderedDict, defaultdict
+
+DEFAULT_ROOM = "Varsayilan_Derslik"
+DAYS = ["Pazartesi", "Salı", "Çarşamba", "Perşembe", "Cuma"]
+
+
+def build_course_def_map(courses):
+    """Ders tanımlarını isme göre sözlüğe çevirir."""
+    course_def_map = {}
+    if courses:
+        for c in courses:
+            if isinstance(c, dict) and c.get('name'):
+                course_def_map[c['name']] = c
+    return course_def_map
+
+
+def resolve_base_name(crs_name, course_def_map):
+    """Etiketli ders adını ("Matematik (Grup A)") tanımlı ana ders adına çözer."""
+    if crs_name in course_def_map:
+        return crs_name
+    if " (" in crs_name and crs_name.endswith(")"):
+        base = crs_name.rsplit(" (", 1)[0]
+        if base in course_def_map:
+            return base
+    return crs_name
+
+
+class RoomEligibility:
+    """
+    (ders, öğretmen) -> uygun derslikler bit kümesi.
+    rooms[i] uygunsa masks[(ders, öğretmen)] değerinin i. biti 1'dir.
+    Çözücü ve "Derslik Kısıtlamaları" ekranı aynı matrisi kullanır.
+    """
+    __slots__ = ("rooms", "masks", "_decoded")
+
+    def __init__(self, rooms, masks):
+        self.rooms = rooms
+        self.masks = masks
+        self._decoded = {}
+
+    def mask(self, crs_name, t_name):
+        return self.masks.get((crs_name, t_name), 0)
+
+    def allowed_rooms(self, crs_name, t_name):
+        m = self.mask(crs_name, t_name)
+        if m not in self._decoded:
+            self._decoded[m] = [r for i, r in enumerate(self.rooms) if m >> i & 1]
+        return self._decoded[m]
+
+    def matrix(self):
+        """Satırları (ders, öğretmen), sütunları derslik olan tablo (list of dict)."""
+        rows = []
+        for (crs_name, t_name), m in sorted(self.masks.items()):
+            row = {"Ders": crs_name, "Öğretmen": t_name}
+            for i, r in enumerate(self.rooms):
+                row[r] = bool(m >> i & 1)
+            rows.append(row)
+        return rows
+
+
+def compile_room_eligibility(courses, rooms, assignments, class_lessons, room_branches=None, room_teachers=None, room_courses=None, room_excluded_courses=None, mode="class"):
+    """
+    Derslik uygunluğunu atanmış tüm (ders, öğretmen) çiftleri için bir kez hesaplar.
+    Kurallar (öncelik sırasıyla):
+      1. Dersin zorunlu dersliği varsa sadece o derslik.
+      2. Sıkı kontrol: Ders listesi + Öğretmen listesi + Branş (öğretmene özel veya ders izinli oda branşı es geçer).
+      3. Esnek kontrol: Öğretmen kısıtlaması esnetilir.
+      4. Sadece "class" modunda: Ders listesi olan özel odalar hariç herhangi bir oda.
+    Yasaklı dersler (room_excluded_courses) 2-4. adımlarda her zaman elenir.
+    """
+    course_def_map = build_course_def_map(courses)
+    room_list = list(rooms) if rooms else [DEFAULT_ROOM]
+    all_mask = (1 << len(room_list)) - 1
+
+    # Oda verilerini bir kez temizleyip ters indekslere (değer -> oda bit kümesi) çevir
+    def index_lists(source, clean=False):
+        by_value = defaultdict(int)
+        unrestricted = 0
+        for i, r in enumerate(room_list):
+            values = (source.get(r) or []) if source else []
+            if clean:
+                values = [str(v).strip() for v in values]
+            if not values:
+                unrestricted |= 1 << i
+            for v in values:
+                by_value[v] |= 1 << i
+        return by_value, unrestricted
+
+    teacher_rooms, no_teacher_list = index_lists(room_teachers, clean=True)
+    branch_rooms, no_branch_list = index_lists(room_branches, clean=True)
+    course_rooms, no_course_list = index_lists(room_courses)
+    excluded_rooms, _ = index_lists(room_excluded_courses)
+
+    masks = {}
+    for c_name, c_lessons in (class_lessons or {}).items():
+        for crs_name in (c_lessons or {}):
+            t_name = (assignments or {}).get(c_name, {}).get(crs_name)
+            if not t_name: continue
+            t_name = str(t_name).strip()
+            if (crs_name, t_name) in masks: continue
+
+            base_crs_name = resolve_base_name(crs_name, course_def_map)
+            crs_def = course_def_map.get(base_crs_name, {})
+
+            # 1. Zorunlu Oda Kontrolü
+            forced_room = crs_def.get('specific_room')
+            if forced_room and rooms and forced_room in rooms:
+                masks[(crs_name, t_name)] = 1 << room_list.index(forced_room)
+                continue
+
+            # 2. Aday Odaları Filtrele (Yasaklı dersler çıkarılır)
+            candidates = all_mask & ~(excluded_rooms.get(crs_name, 0) | excluded_rooms.get(base_crs_name, 0))
+
+            crs_branch = crs_def.get('branch')
+            clean_crs_branch = str(crs_branch).strip() if crs_branch else ""
+
+            course_explicit = course_rooms.get(crs_name, 0) | course_rooms.get(base_crs_name, 0)
+            course_ok = no_course_list | course_explicit
+            teacher_room = teacher_rooms.get(t_name, 0)
+            teacher_ok = no_teacher_list | teacher_room
+            branch_ok = no_branch_list | branch_rooms.get(clean_crs_branch, 0)
+
+            # Pass 1: Strict Check (Branch + Teacher)
+            allowed = candidates & course_ok & teacher_ok & (branch_ok | teacher_room | course_explicit)
+            # Pass 2: Fallback (Branch Only) - Öğretmen kısıtlamasını esnet
+            if not allowed:
+                allowed = candidates & course_ok & (branch_ok | course_explicit)
+            # Pass 3: Ultimate Fallback (Any Room) - Sadece özel olmayan veya dersin izinli olduğu odalar
+            if not allowed and mode == "class":
+                allowed = candidates & course_ok
+
+            masks[(crs_name, t_name)] = allowed
+
+    return RoomEligibility(room_list, masks)
+
+
+def parse_slot(slot):
+    """ "Gün:Saat" metnini (gün, saat) ikilisine çevirir. Geçersizse None döner. """
+    if not isinstance(slot, str) or ":" not in slot:
+        return None
+    d_str, h_str = slot.split(":", 1)
+    try:
+        return d_str.strip(), int(h_str.strip())
+    except ValueError:
+        return None
+
+
+def room_capacity(room_capacities, r_name):
+    """Derslik kapasitesi (geçersiz/boş değerlerde 1)."""
+    try:
+        return int((room_capacities or {}).get(r_name, 1) or 1)
+    except (TypeError, ValueError):
+        return 1
+
+
+def safe_int(val, default):
+    """Sayıya çevrilemeyen (None, NaN, metin) değerlerde varsayılanı döndürür."""
+    try:
+        if val is None: return default
+        if isinstance(val, float) and val != val: return default
+        return int(val)
+    except (TypeError, ValueError):
+        return default
+
+
+class ProblemModel:
+    """
+    Okul verisinin tamsayı kimlikli, önceden çözümlenmiş hali.
+
+    Kimlikler listelerdeki sıradır (teacher_names[t_id], course_names[crs_id], ...).
+    Öğretmen müsaitliği bit maskesidir: (gün sırası * num_hours + saat - 1). bit 1 ise öğretmen o saatte müsait değildir.
+    lessons: Programa yerleşecek dersler [(sınıf_id, ders_id, öğretmen_id, haftalık saat), ...]
+    (Sadece öğretmeni atanmış ve saati > 0 olan dersler.)
+    """
+    __slots__ = (
+        "version", "days", "num_hours", "hours", "lunch_break_hour",
+        "teacher_names", "teacher_id", "teacher_known", "teacher_unavailable", "teacher_max_daily",
+        "teacher_preference", "teacher_load",
+        "course_names", "course_id", "course_base", "course_branch", "course_max_daily", "course_block_size",
+        "course_specific_room",
+        "class_names", "class_id", "class_load",
+        "room_names", "room_id", "room_capacity",
+        "lessons", "lesson_index", "class_lessons", "assignments",
+        "_room_data", "_eligibility",
+    )
+
+    def slot_bit(self, d_idx, h):
+        return 1 << (d_idx * self.num_hours + h - 1)
+
+    def is_blocked(self, t_id, d_idx, h):
+        """Öğretmen bu saatte müsait değil mi? (İzin günü / kısıtlı saat)"""
+        return bool(self.teacher_unavailable[t_id] & self.slot_bit(d_idx, h))
+
+    def open_slots(self, t_id=None):
+        """Ders yapılabilecek (gün, saat) listesi: Öğle arası ve (verilirse) öğretmenin kapalı saatleri hariç."""
+        return [
+            (d, h) for d_idx, d in enumerate(self.days) for h in self.hours
+            if h != self.lunch_break_hour and (t_id is None or not self.is_blocked(t_id, d_idx, h))
+        ]
+
+    def teacher_blocked_slots(self, t_name):
+        """Öğretmenin kapalı saatleri: {(gün, saat), ...}"""
+        t_id = self.teacher_id.get(str(t_name).strip())
+        if t_id is None:
+            return set()
+        return {(d, h) for d_idx, d in enumerate(self.days) for h in self.hours if self.is_blocked(t_id, d_idx, h)}
+
+    def teacher_weekly_capacity(self, t_name, daily_limit=True):
+        """
+        Öğretmenin haftada verebileceği en fazla ders saati (kapalı saatler, öğle arası ve günlük limit gözetilir).
+        daily_limit=False: Günlük limit (çözücüde yumuşak kural) düşülmez, sadece kesin kapasite.
+        """
+        t_id = self.teacher_id.get(str(t_name).strip())
+        if t_id is None:
+            return len(self.open_slots())
+        limit = self.teacher_max_daily[t_id] if daily_limit else self.num_hours
+        per_day = defaultdict(int)
+        for d, _ in self.open_slots(t_id):
+            per_day[d] += 1
+        return sum(min(n, limit) for n in per_day.values())
+
+    def teacher_props(self, t_name):
+        """Öğretmenin çözümlenmiş özellikleri (haftalık ders yükü, günlük limit)."""
+        t_id = self.teacher_id.get(str(t_name).strip())
+        if t_id is None:
+            return {"load": 0, "max_hours_per_day": self.num_hours}
+        return {"load": self.teacher_load[t_id], "max_hours_per_day": self.teacher_max_daily[t_id]}
+
+    def course_props(self, crs_name):
+        """Dersin (etiketliyse ana dersin) çözümlenmiş özellikleri."""
+        crs_id = self.course_id.get(crs_name)
+        if crs_id is None:
+            return {"base": crs_name, "branch": "", "max_daily_hours": 2, "block_size": 1, "specific_room": None}
+        return {
+            "base": self.course_base[crs_id],
+            "branch": self.course_branch[crs_id],
+            "max_daily_hours": self.course_max_daily[crs_id],
+            "block_size": self.course_block_size[crs_id],
+            "specific_room": self.course_specific_room[crs_id],
+        }
+
+    def eligibility(self, mode="class"):
+        """Derslik uygunluk matrisi (mod başına bir kez derlenir)."""
+        if mode not in self._eligibility:
+            courses, rooms, room_branches, room_teachers, room_courses, room_excluded_courses = self._room_data
+            self._eligibility[mode] = compile_room_eligibility(
+                courses, rooms, self.assignments, {c: self.class_lessons.get(c, {}) for c in self.class_names},
+                room_branches=room_branches, room_teachers=room_teachers, room_courses=room_courses,
+                room_excluded_courses=room_excluded_courses, mode=mode
+            )
+        return self._eligibility[mode]
+
+
+def problem_version(*parts):
+    """Veri sürümü: Girdilerin içerik özeti (aynı veri -> aynı sürüm)."""
+    payload = json.dumps(parts, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def build_problem(teachers, courses, classes, class_lessons, assignments, rooms, room_capacities=None, room_branches=None, room_teachers=None, room_courses=None, room_excluded_courses=None, lunch_break_hour=None, num_hours=8, version=None):
+    """Okul verisinden ProblemModel oluşturur."""
+    p = ProblemModel()
+    p.version = version
+    p.days = tuple(DAYS)
+    p.num_hours = safe_int(num_hours, 8)
+    p.hours = range(1, p.num_hours + 1)
+    p.lunch_break_hour = safe_int(lunch_break_hour, None)
+    day_index = {d: i for i, d in enumerate(p.days)}
+
+    # Sınıflar ve ders yükleri (Sayısal değerleri garantiye al)
+    p.class_names = list(classes or [])
+    p.class_id = {c: i for i, c in enumerate(p.class_names)}
+    p.class_lessons = {}
+    for c, c_lessons in (class_lessons or {}).items():
+        p.class_lessons[c] = {crs: safe_int(cnt, 0) for crs, cnt in (c_lessons or {}).items()}
+    p.class_load = [sum(p.class_lessons.get(c, {}).values()) for c in p.class_names]
+
+    # Atamalar (Öğretmen isimleri temizlenir)
+    p.assignments = {
+        c: {crs: str(t).strip() for crs, t in (c_assign or {}).items() if t}
+        for c, c_assign in (assignments or {}).items()
+    }
+
+    # Öğretmenler (Tanımlı olanlar + sadece atamalarda geçenler)
+    p.teacher_names, p.teacher_id = [], {}
+    p.teacher_known, p.teacher_unavailable, p.teacher_max_daily, p.teacher_preference = [], [], [], []
+
+    def add_teacher(t_name, t_def=None):
+        if t_name in p.teacher_id:
+            return p.teacher_id[t_name]
+        p.teacher_id[t_name] = len(p.teacher_names)
+        p.teacher_names.append(t_name)
+        p.teacher_known.append(t_def is not None)
+        mask = 0
+        if t_def is not None:
+            for d in t_def.get('unavailable_days') or []:
+                d_idx = day_index.get(str(d).strip())
+                if d_idx is not None:
+                    for h in p.hours:
+                        mask |= p.slot_bit(d_idx, h)
+            for slot in t_def.get('unavailable_slots') or []:
+                parsed = parse_slot(slot)
+                if parsed and parsed[0] in day_index and 1 <= parsed[1] <= p.num_hours:
+                    mask |= p.slot_bit(day_index[parsed[0]], parsed[1])
+        p.teacher_unavailable.append(mask)
+        p.teacher_max_daily.append(safe_int(t_def.get('max_hours_per_day'), 8) if t_def is not None else p.num_hours)
+        pref = t_def.get('preference') if t_def is not None else None
+        p.teacher_preference.append(pref if pref and pref != "Farketmez" else None)
+        return p.teacher_id[t_name]
+
+    for t in teachers or []:
+        if t and t.get('name'):
+            add_teacher(str(t['name']).strip(), t)
+
+    # Dersler (Tanımlı olanlar + sınıf yüklerinde geçen etiketli adlar)
+    course_def_map = build_course_def_map(courses)
+    p.course_names, p.course_id = [], {}
+    p.course_base, p.course_branch, p.course_max_daily, p.course_block_size, p.course_specific_room = [], [], [], [], []
+
+    def add_course(crs_name):
+        if crs_name in p.course_id:
+            return p.course_id[crs_name]
+        base = resolve_base_name(crs_name, course_def_map)
+        crs_def = course_def_map.get(base, {})
+        p.course_id[crs_name] = len(p.course_names)
+        p.course_names.append(crs_name)
+        p.course_base.append(base)
+        branch = crs_def.get('branch')
+        p.course_branch.append(str(branch).strip() if branch else "")
+        p.course_max_daily.append(safe_int(crs_def.get('max_daily_hours', 2), 2))
+        p.course_block_size.append(safe_int(crs_def.get('block_size', 1), 1))
+        room = crs_def.get('specific_room')
+        p.course_specific_room.append(room if room and rooms and room in rooms else None)
+        return p.course_id[crs_name]
+
+    for crs_name in course_def_map:
+        add_course(crs_name)
+
+    # Derslikler
+    p.room_names = list(rooms) if rooms else [DEFAULT_ROOM]
+    p.room_id = {r: i for i, r in enumerate(p.room_names)}
+    p.room_capacity = [room_capacity(room_capacities, r) for r in p.room_names]
+
+    # Yerleşecek dersler
+    p.lessons, p.lesson_index = [], {}
+    p.teacher_load = defaultdict(int)
+    for c_name in p.class_names:
+        for crs_name, count in p.class_lessons.get(c_name, {}).items():
+            crs_id = add_course(crs_name)
+            t_name = p.assignments.get(c_name, {}).get(crs_name)
+            if count <= 0 or not t_name: continue
+            t_id = add_teacher(t_name)
+            p.lesson_index[(c_name, crs_name)] = len(p.lessons)
+            p.lessons.append((p.class_id[c_name], crs_id, t_id, count))
+            p.teacher_load[t_id] += count
+    p.teacher_load = [p.teacher_load.get(t_id, 0) for t_id in range(len(p.teacher_names))]
+
+    p._room_data = (courses, rooms, room_branches, room_teachers, room_courses, room_excluded_courses)
+    p._eligibility = {}
+    return p
+
+
+_PROBLEM_CACHE = OrderedDict()
+_PROBLEM_CACHE_SIZE = 8
+
+
+def get_problem(teachers, courses, classes, class_lessons, assignments, rooms, room_capacities=None, room_branches=None, room_teachers=None, room_courses=None, room_excluded_courses=None, lunch_break_hour=None, num_hours=8):
+    """
+    Veri sürümü başına bir kez ProblemModel oluşturur (önbellekli).
+    Aynı veriyle tekrar çağrıldığında temizlik ve ayrıştırma yapılmadan önbellekteki model döner.
+    """
+    args = (teachers, courses, classes, class_lessons, assignments, rooms, room_capacities, room_branches,
+            room_teachers, room_courses, room_excluded_courses, lunch_break_hour, num_hours)
+    version = problem_version(*args)
+    if version in _PROBLEM_CACHE:
+        _PROBLEM_CACHE.move_to_end(version)
+        return _PROBLEM_CACHE[version]
+    problem = build_problem(*args, version=version)
+    _PROBLEM_CACHE[version] = problem
+    if len(_PROBLEM_CACHE) > _PROBLEM_CACHE_SIZE:
+        _PROBLEM_CACHE.popitem(last=False)
+    return problem
@@ -1,171 +1,1052 @@
+import multiprocessing
+import os
+import queue
+import re
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from ortools.graph.python import max_flow, min_cost_flow
 from ortools.sat.python import cp_model
 
-def create_timetable(teachers, courses, classes, class_lessons, assignments, rooms, room_capacities=None, room_branches=None, room_teachers=None, room_courses=None, room_excluded_courses=None, mode="class", lunch_break_hour=None, num_hours=8, simultaneous_lessons=None, min_daily_hours=2, progress_callback=None):
+from problem import (
+    DAYS, build_course_def_map, get_problem, room_capacity as _room_capacity, safe_int,
+)
+
+
+def eligibility_groups(eligibility, room_capacities, lesson_masks):
+    """
+    İki aşamalı model için derslik grupları: Her farklı uygunluk kümesi ve kesişen kümelerin ikili birleşimleri.
+    lesson_masks: ders anahtarı -> uygun derslik bit kümesi
+    Dönüş: [(grup bit kümesi, toplam kapasite, [ders anahtarı, ...])] - grubun dışına çıkamayan dersler.
+    """
+    masks = sorted(set(m for m in lesson_masks.values() if m))
+    groups = set(masks)
+    for i, m1 in enumerate(masks):
+        for m2 in masks[i + 1:]:
+            if m1 & m2:
+                groups.add(m1 | m2)
+
+    result = []
+    for g in sorted(groups):
+        cap = sum(_room_capacity(room_capacities, r) for i, r in enumerate(eligibility.rooms) if g >> i & 1)
+        members = [lesson for lesson, m in lesson_masks.items() if m and not m & ~g]
+        result.append((g, cap, members))
+    return result
+
+
+def assign_rooms_by_flow(schedule, eligibility, room_capacities=None):
+    """
+    Derslik bazlı iki aşamalı çözümün 2. aşaması: Her saat diliminde dersleri dersliklere
+    minimum maliyetli akış ile eşleştirir (kaynak -> ders -> uygun derslik -> hedef).
+    Maliyet: Bir önceki saatte aynı dersin kullandığı derslik 0, diğerleri haftalık kullanım + 1
+    (derslik yükü dengelenir). Herhangi bir saat diliminde tam eşleşme yoksa None döner.
+    """
+    day_order = {d: i for i, d in enumerate(DAYS)}
+    slots = defaultdict(list)
+    for item in schedule:
+        slots[(day_order.get(item["Gün"], len(DAYS)), item["Saat"])].append(item)
+
+    room_list = eligibility.rooms
+    usage = [0] * len(room_list)
+    previous_room = {} # (sınıf, ders, gün, saat) -> derslik
+    result = []
+    for slot_key in sorted(slots):
+        items = slots[slot_key]
+        flow = min_cost_flow.SimpleMinCostFlow()
+        source, sink = 0, 1
+        item_node = lambda k: 2 + k
+        room_node = lambda i: 2 + len(items) + i
+        item_arcs = []
+        for k, item in enumerate(items):
+            flow.add_arc_with_capacity_and_unit_cost(source, item_node(k), 1, 0)
+            prev = previous_room.get((item["Sınıf"], item["Ders"], item["Gün"], item["Saat"] - 1))
+            m = eligibility.mask(item["Ders"], item["Öğretmen"])
+            arcs = []
+            for i, r_name in enumerate(room_list):
+                if m >> i & 1:
+                    cost = 0 if r_name == prev else usage[i] + 1
+                    arcs.append((flow.add_arc_with_capacity_and_unit_cost(item_node(k), room_node(i), 1, cost), i))
+            item_arcs.append(arcs)
+        for i, r_name in enumerate(room_list):
+            flow.add_arc_with_capacity_and_unit_cost(room_node(i), sink, _room_capacity(room_capacities, r_name), 0)
+        flow.set_node_supply(source, len(items))
+        flow.set_node_supply(sink, -len(items))
+
+        if flow.solve() != flow.OPTIMAL:
+            return None
+        for item, arcs in zip(items, item_arcs):
+            chosen = next((i for arc, i in arcs if flow.flow(arc) > 0), None)
+            if chosen is None:
+                return None
+            usage[chosen] += 1
+            previous_room[(item["Sınıf"], item["Ders"], item["Gün"], item["Saat"])] = room_list[chosen]
+            result.append(dict(item, Derslik=room_list[chosen]))
+    return result
+
+
+def detect_room_pools(rooms, courses, room_capacities=None, room_branches=None, room_teachers=None, room_courses=None, room_excluded_courses=None):
+    """
+    Birbirinin yerine geçebilen derslikleri gruplar (kapasite, branş, öğretmen, ders ve yasaklı ders listeleri aynı).
+    Bir dersin zorunlu dersliği olan odalar havuza alınmaz. Dönüş: [[derslik, ...], ...] (derslik sırası korunur).
+    """
+    forced_rooms = set(c.get('specific_room') for c in build_course_def_map(courses).values() if c.get('specific_room'))
+
+    def signature(r_name):
+        def clean(source):
+            return frozenset(str(v).strip() for v in ((source or {}).get(r_name) or []))
+        return (
+            _room_capacity(room_capacities, r_name), clean(room_branches), clean(room_teachers),
+            clean(room_courses), clean(room_excluded_courses)
+        )
+
+    pools = {}
+    result = []
+    for r_name in rooms:
+        if r_name in forced_rooms:
+            result.append([r_name])
+            continue
+        key = signature(r_name)
+        if key not in pools:
+            pools[key] = [r_name]
+            result.append(pools[key])
+        else:
+            pools[key].append(r_name)
+    return result
+
+
+def unpack_room_pools(schedule, room_pools, room_capacities=None, previous=None):
+    """
+    Havuz adıyla gelen dersleri havuzdaki gerçek dersliklere dağıtır. Her saat diliminde havuzun
+    toplam kapasitesi aşılmadığı için dağıtım her zaman mümkündür; blok derslerde önceki saatin dersliği
+    korunur, diğer durumlarda en az kullanılan derslik seçilir.
+    previous: Önceki program / sabitlenmiş dersler. Aynı saatteki ders (havuzda boşsa) o dersliği alır.
+    """
+    kept_room = {
+        (it.get("Sınıf"), it.get("Ders"), it.get("Gün"), it.get("Saat")): it.get("Derslik")
+        for it in previous or [] if isinstance(it, dict)
+    }
+    day_order = {d: i for i, d in enumerate(DAYS)}
+    usage = defaultdict(int)
+    slot_usage = defaultdict(int) # (derslik, gün, saat) -> kullanım
+    previous_room = {} # (sınıf, ders, gün, saat) -> derslik
+    result = []
+    ordered = sorted(schedule, key=lambda it: (
+        day_order.get(it["Gün"], len(DAYS)), it["Saat"], (it["Sınıf"], it["Ders"], it["Gün"], it["Saat"]) not in kept_room
+    ))
+    for item in ordered:
+        members = room_pools.get(item["Derslik"], [item["Derslik"]])
+        if len(members) > 1:
+            free = [r for r in members if slot_usage[(r, item["Gün"], item["Saat"])] < _room_capacity(room_capacities, r)]
+            prev = previous_room.get((item["Sınıf"], item["Ders"], item["Gün"], item["Saat"] - 1))
+            kept = kept_room.get((item["Sınıf"], item["Ders"], item["Gün"], item["Saat"]))
+            if kept in free:
+                chosen = kept
+            else:
+                chosen = prev if prev in free else min(free or members, key=lambda r: usage[r])
+            item = dict(item, Derslik=chosen)
+        slot_usage[(item["Derslik"], item["Gün"], item["Saat"])] += 1
+        usage[item["Derslik"]] += 1
+        previous_room[(item["Sınıf"], item["Ders"], item["Gün"], item["Saat"])] = item["Derslik"]
+        result.append(item)
+    return result
+
+
+def assign_rooms(schedule, eligibility, room_capacities=None, previous=None, strict=False):
+    """
+    Saatleri belirlenmiş derslere uygun derslikleri açgözlü (greedy) yöntemle atar.
+    Her saat diliminde en az seçeneği olan ders önce yerleşir; dolu olmayan derslikler,
+    blok derslerde bir önceki saatte kullanılan derslik ve az kullanılan derslikler tercih edilir.
+    Boş derslik kalmazsa (sınıf modunda derslik kısıtı yoktur) en az kullanılan uygun derslik verilir.
+    previous: Önceki program. Aynı saatte kalan dersler (uygun ve boşsa) eski dersliklerini korur.
+    strict: Derslik kapasitesi aşılmaz; boş uygun derslik kalmayan dersin dersliği None bırakılır.
+    """
+    kept_room = {
+        (it.get("Sınıf"), it.get("Ders"), it.get("Gün"), it.get("Saat")): it.get("Derslik")
+        for it in previous or [] if isinstance(it, dict)
+    }
+    day_order = {d: i for i, d in enumerate(DAYS)}
+    slots = defaultdict(list)
+    for item in schedule:
+        slots[(day_order.get(item["Gün"], len(DAYS)), item["Saat"])].append(item)
+
+    usage = defaultdict(int) # Derslik -> haftalık kullanım
+    previous_room = {} # (sınıf, ders, gün, saat) -> derslik
+    result = []
+    for slot_key in sorted(slots):
+        slot_usage = defaultdict(int)
+        items = sorted(slots[slot_key], key=lambda it: (
+            (it["Sınıf"], it["Ders"], it["Gün"], it["Saat"]) not in kept_room,
+            len(eligibility.allowed_rooms(it["Ders"], it["Öğretmen"]))
+        ))
+        for item in items:
+            allowed = eligibility.allowed_rooms(item["Ders"], item["Öğretmen"])
+            if not allowed:
+                result.append(dict(item, Derslik=None))
+                continue
+            prev = previous_room.get((item["Sınıf"], item["Ders"], item["Gün"], item["Saat"] - 1))
+            free = [r for r in allowed if slot_usage[r] < _room_capacity(room_capacities, r)]
+            kept = kept_room.get((item["Sınıf"], item["Ders"], item["Gün"], item["Saat"]))
+            if kept in free:
+                chosen = kept
+            elif prev in free:
+                chosen = prev
+            elif strict and not free:
+                result.append(dict(item, Derslik=None))
+                continue
+            else:
+                chosen = min(free or allowed, key=lambda r: usage[r])
+            slot_usage[chosen] += 1
+            usage[chosen] += 1
+            previous_room[(item["Sınıf"], item["Ders"], item["Gün"], item["Saat"])] = chosen
+            result.append(dict(item, Derslik=chosen))
+    return result
+
+
+def solver_values(solver, variables, solution=None):
+    """
+    Değişkenlerin çözümdeki değerleri (solver.Value çağrısı yerine tek seferde, NumPy dizisi).
+    solution verilirse (saklanmış tam çözüm dizisi) değerler oradan okunur.
+    """
+    if solution is None:
+        solution = np.asarray(solver.ResponseProto().solution, dtype=np.int64)
+    var_ids = np.fromiter((var.Index() for var in variables), dtype=np.int64, count=len(variables))
+    return solution[var_ids]
+
+
+class IncumbentCallback(cp_model.CpSolverSolutionCallback):
+    """
+    Arama sürerken bulunan her yeni (daha iyi) çözümü çağırana bildirir.
+    stop_at_hours verilirse yerleşen ders saati bu sayıya ulaşınca arama durdurulur (taslak mod).
+    on_incumbent(info) çözücünün iş parçacığından çağrılır (None olabilir); info sözlüğü:
+        solution: Kaçıncı çözüm, time: Geçen süre (sn), objective / bound: Amaç değeri ve üst sınır,
+        missing_hours: Yerleşemeyen ders saati, violations: İhlal edilen yumuşak kural sayısı,
+        schedule: Ara çözümün programını döndüren fonksiyon (önizleme için, çağrıldığında hesaplanır).
+    """
+
+    def __init__(self, on_incumbent, lesson_vars, missing_vars, penalty_vars, make_schedule, stop_at_hours=None):
+        super().__init__()
+        self._stop_at_hours = stop_at_hours
+        self._on_incumbent = on_incumbent
+        self._lesson_ids = np.fromiter((var.Index() for var in lesson_vars), dtype=np.int64, count=len(lesson_vars))
+        self._missing_ids = np.fromiter((var.Index() for var in missing_vars), dtype=np.int64, count=len(missing_vars))
+        self._penalty_ids = np.fromiter((var.Index() for var in penalty_vars), dtype=np.int64, count=len(penalty_vars))
+        self._make_schedule = make_schedule
+        self.solution_count = 0
+
+    def on_solution_callback(self):
+        self.solution_count += 1
+        solution = np.asarray(self.response_proto.solution, dtype=np.int64)
+        values = solution[self._lesson_ids]
+        if self._stop_at_hours is not None and values.sum() >= self._stop_at_hours:
+            self.StopSearch() # Taslak mod: Tüm ders saatleri yerleşti
+        if self._on_incumbent is None:
+            return
+        self._on_incumbent({
+            "solution": self.solution_count,
+            "time": self.WallTime(),
+            "objective": self.ObjectiveValue(),
+            "bound": self.BestObjectiveBound(),
+            "missing_hours": int(solution[self._missing_ids].sum()),
+            "violations": int((solution[self._penalty_ids] > 0).sum()),
+            "schedule": lambda: self._make_schedule(values),
+        })
+
+
+# Aşamalı (sözlük sıralı) amaç: Her aşama bir önceki aşamanın değerini sabitleyerek sıradaki hedefi iyileştirir.
+# (etiket, ceza ağırlığı) - Ceza ağırlığı None olan aşama yerleşen ders saatini maksimize eder; "rest" aşaması
+# kalan tüm terimleri (günlük minimum, derslik dengesi, onarım ödülü) eski ağırlıklarıyla toplar.
+LEXICOGRAPHIC_TIERS = [
+    ("Yerleşen Ders Saati", None),
+    ("Öğretmen Günlük Limit", 50000),
+    ("Ders Günlük Limit", 10000),
+    ("Öğretmen Tercihi", 20000),
+    ("Diğer Yumuşak Kurallar", "rest"),
+]
+LEXICOGRAPHIC_TIME_SHARES = [0.4, 0.15, 0.15, 0.15, 0.15] # Aşamaların süre payları (kullanılmayan süre sonrakilere kalır)
+
+
+def hint_solution(model, solution):
+    """Modeldeki tüm değişkenlere verilen tam çözümü ipucu olarak ekler (önceki ipuçları silinir)."""
+    model.ClearHints()
+    hint = model.Proto().solution_hint
+    hint.vars.extend(range(len(solution)))
+    hint.values.extend(int(v) for v in solution)
+
+
+def watch_stop_event(solver, stop_event, finished):
+    """Arama bitene kadar stop_event'i izler; işaretlenirse aramayı durdurur (en iyi ara çözüm korunur)."""
+    while not finished.is_set():
+        if stop_event.wait(0.2):
+            solver.StopSearch()
+            return
+
+
+def extract_schedule(problem, var_index, room_axis, values):
+    """
+    Değişken tensöründen programı okur.
+    var_index[ders satırı, derslik sütunu, gün, saat - 1] -> değişken sırası (-1: yok), values -> değişken değerleri.
+    """
+    placed = var_index >= 0
+    chosen = np.zeros(var_index.shape, dtype=bool)
+    chosen[placed] = values[var_index[placed]] > 0
+    schedule = []
+    for a, r_col, d_idx, h_idx in np.argwhere(chosen).tolist():
+        c_id, crs_id, t_id, _ = problem.lessons[a]
+        schedule.append({
+            "Sınıf": problem.class_names[c_id],
+            "Ders": problem.course_names[crs_id],
+            "Öğretmen": problem.teacher_names[t_id],
+            "Derslik": room_axis[r_col],
+            "Gün": problem.days[d_idx],
+            "Saat": h_idx + 1
+        })
+    return schedule
+
+
+def previous_placements(problem, schedule, room_col, room_pool_of):
+    """
+    Önceki programın (last_schedule) yeni modeldeki karşılıkları: ders satırı -> {(derslik sütunu, gün, saat - 1), ...}
+    Sınıf/ders artık yoksa veya gün/saat geçersizse kayıt atlanır. Derslik bazlı modelde derslik havuzuna
+    çevrilir; derslik silinmişse sütun None olur (hint_positions dersin tek sütunu varsa onu kullanır).
+    """
+    day_index = {d: i for i, d in enumerate(problem.days)}
+    placements = defaultdict(set)
+    for item in schedule or []:
+        if not isinstance(item, dict): continue
+        a = problem.lesson_index.get((item.get("Sınıf"), item.get("Ders")))
+        d_idx = day_index.get(item.get("Gün"))
+        h = safe_int(item.get("Saat"), 0)
+        if a is None or d_idx is None or not 1 <= h <= problem.num_hours: continue
+        if None in room_col:
+            r_col = room_col[None]
+        else:
+            r_col = room_col.get(room_pool_of.get(item.get("Derslik")))
+        placements[a].add((r_col, d_idx, h - 1))
+    return placements
+
+
+def hint_positions(var_index, placements):
+    """Önceki yerleşimlerin lesson_vars içindeki sıraları (o saat için değişken budanmışsa atlanır)."""
+    positions = set()
+    for a, slots in placements.items():
+        for r_col, d_idx, h_idx in slots:
+            if r_col is None:
+                cols = np.flatnonzero((var_index[a] >= 0).any(axis=(1, 2)))
+                if len(cols) != 1: continue
+                r_col = int(cols[0])
+            pos = int(var_index[a, r_col, d_idx, h_idx])
+            if pos >= 0:
+                positions.add(pos)
+    return positions
+
+
+def repair_neighborhood(problem, seed_rows, depth):
+    """
+    Onarım modunda yeniden çözülecek ders satırları: Başlangıç satırları ve depth adım boyunca
+    onlarla aynı sınıfı veya öğretmeni paylaşan (çakışabilecek) dersler.
+    """
+    by_class, by_teacher = defaultdict(set), defaultdict(set)
+    for a, (c_id, _, t_id, _) in enumerate(problem.lessons):
+        by_class[c_id].add(a)
+        by_teacher[t_id].add(a)
+    rows = set(seed_rows)
+    for _ in range(depth):
+        grown = set(rows)
+        for a in rows:
+            c_id, _, t_id, _ = problem.lessons[a]
+            grown |= by_class[c_id] | by_teacher[t_id]
+        if grown == rows: break
+        rows = grown
+    return rows
+
+
+def block_durations(problem, crs_id, count):
+    """
+    Blok dersin (block_size > 1) bir günde yapılabileceği süreler (bkz. 12): 0, blok katları (günlük limit
+    izin verdiği kadar) ve haftalık saatin bloğa bölünmeyen kalanı. Örn: Haftalık 5 saat, blok 2 -> 0, 1, 2 (, 4).
+    """
+    blk = problem.course_block_size[crs_id]
+    limit = max(problem.course_max_daily[crs_id], blk) # Limit en az blok kadar olmalı
+    allowed = {0} | set(range(blk, min(limit, count) + 1, blk))
+    if count % blk:
+        allowed.add(count % blk)
+    return sorted(allowed)
+
+
+def simultaneous_groups(problem, simultaneous_lessons):
+    """
+    Eş zamanlı ders grupları (Sınıf bölme): [[ders satırı, ...], ...]. Grubun ilk satırı liderdir.
+    Ders Atama sayfası aynı gruba ikiden fazla etiketli ders ekleyebilir; tüm üyeler alınır, ortak üyesi olan
+    gruplar birleştirilir. Atanmamış (problem.lessons'ta olmayan) üyeler atlanır.
+    """
+    groups = []
+    for c_name, pairs in (simultaneous_lessons or {}).items():
+        for pair in pairs or []:
+            rows = [problem.lesson_index[(c_name, crs)] for crs in pair if (c_name, crs) in problem.lesson_index]
+            rows = list(dict.fromkeys(rows))
+            for group in [g for g in groups if set(g) & set(rows)]:
+                groups.remove(group)
+                rows = group + [a for a in rows if a not in group]
+            groups.append(rows)
+    return [g for g in groups if len(g) > 1]
+
+
+def lesson_components(problem, mode="class"):
+    """
+    Öğretmen-sınıf(-derslik) grafiğinin bağlantılı bileşenleri: Ortak öğretmeni, sınıfı ve derslik modunda ortak
+    uygun dersliği olmayan ders grupları birbirinden bağımsız çözülebilir. (Sınıf modunda derslikler modele
+    girmediği için sadece öğretmen ve sınıf bağlar.)
+    Dönüş: [[sınıf adı, ...], ...] - büyükten küçüğe, sınıflar problem sırasında.
+    """
+    parent = list(range(len(problem.lessons)))
+
+    def find(a):
+        while parent[a] != a:
+            parent[a] = parent[parent[a]]
+            a = parent[a]
+        return a
+
+    first_of = {} # ("c"/"t"/"r", kimlik) -> o kaynağı kullanan ilk ders satırı
+    eligibility = problem.eligibility(mode) if mode == "room" else None
+    for a, (c_id, crs_id, t_id, _) in enumerate(problem.lessons):
+        keys = [("c", c_id), ("t", t_id)]
+        if eligibility is not None:
+            m = eligibility.mask(problem.course_names[crs_id], problem.teacher_names[t_id])
+            keys += [("r", i) for i in range(len(eligibility.rooms)) if m >> i & 1]
+        for key in keys:
+            if key in first_of:
+                parent[find(a)] = find(first_of[key])
+            else:
+                first_of[key] = a
+
+    components = defaultdict(set)
+    for a, (c_id, _, _, _) in enumerate(problem.lessons):
+        components[find(a)].add(c_id)
+    result = [[problem.class_names[c_id] for c_id in sorted(c_ids)] for c_ids in components.values()]
+    return sorted(result, key=len, reverse=True)
+
+
+def feasibility_precheck(problem, mode="class", simultaneous_lessons=None, warnings=None):
+    """
+    Model kurulmadan önce gerekli koşul kontrolleri (milisaniyeler sürer). Koşullardan biri sağlanmıyorsa
+    tüm ders saatlerinin yerleşmesi kesin olarak imkansızdır:
+      - Öğretmen yükü <= Haftalık kapasite (izin günleri, kısıtlı saatler ve öğle arası düşülmüş). Günlük limit
+        çözücüde yumuşak kuraldır (6): Sadece günlük limitle aşılan yük engel değildir, warnings listesine
+        (verilmişse) uyarı olarak eklenir.
+      - Sınıf yükü (eş zamanlı ikinci dersler hariç) <= Haftalık ders saati
+      - Derslik modunda: Derslerin uygun dersliklere dağıtılabilmesi (maksimum akış: kaynak -> ders -> uygun
+        derslik -> hedef). Akış yetmezse en küçük kesim, kapasitesi yetmeyen derslik grubunu gösterir.
+      - Blok yerleşimi: Ders her gün tek parça (7) ve izin verilen sürelerde (12) yapılır. Öğretmenin o günkü
+        en uzun kesintisiz müsait aralığına sığan günlük sürelerle haftalık saat toplanabilmeli.
+    Dönüş: Sorun metinleri ("🔴 ...\\n   💡 ÖNERİ: ..."), sorun yoksa boş liste.
+    """
+    hints = []
+    days = problem.days
+    weekly_slots = len(problem.open_slots())
+    daily_slots = weekly_slots // len(days) if days else 0
+
+    # 1. Öğretmen Kapasite Kontrolü
+    for t_id, t_name in enumerate(problem.teacher_names):
+        t_load = problem.teacher_load[t_id]
+        if t_load == 0: continue
+        t_cap = problem.teacher_weekly_capacity(t_name, daily_limit=False)
+        if t_load <= t_cap:
+            limited_cap = problem.teacher_weekly_capacity(t_name)
+            if t_load > limited_cap and warnings is not None:
+                warnings.append(f"🟡 {t_name}: Atanan {t_load} > Günlük limitle müsait {limited_cap} (Günlük Limit: {problem.teacher_max_daily[t_id]}). Program oluşturulur, günlük limit aşılır.\n   💡 ÖNERİ: Günlük limiti artır")
+            continue
+
+        open_days = {d for d, _ in problem.open_slots(t_id)}
+        working_days = len(open_days)
+        blocked = len([s for s in problem.open_slots() if s[0] in open_days]) - len(problem.open_slots(t_id))
+        details = f"Gün: {working_days}, Günlük Saat: {daily_slots}"
+        suggestions = []
+        if working_days < len(days): suggestions.append("İzin gününü kaldır")
+        if blocked > 0:
+            suggestions.append("Kısıtlı saatleri aç")
+            details += f", Kısıtlı Saat: {blocked}"
+        suggestion_text = " | ".join(suggestions) if suggestions else "Ders yükünü azalt"
+        hints.append(f"🔴 {t_name}: Atanan {t_load} > Müsait {t_cap} ({details})\n   💡 ÖNERİ: {suggestion_text}")
+
+    # 2. Sınıf Yükü Kontrolü
+    followers = {a for group in simultaneous_groups(problem, simultaneous_lessons) for a in group[1:]}
+    class_load = defaultdict(int)
+    for a, (c_id, crs_id, t_id, count) in enumerate(problem.lessons):
+        if a not in followers:
+            class_load[c_id] += count
+    for c_id, c_load in sorted(class_load.items()):
+        if c_load > weekly_slots:
+            hints.append(f"🔴 Sınıf {problem.class_names[c_id]}: Ders Yükü {c_load} > Haftalık Kapasite {weekly_slots}\n   💡 ÖNERİ: Ders saatlerini azaltın veya günlük ders saati sayısını artırın.")
+
+    # 3. Derslik Kapasitesi (Maksimum Akış)
+    eligibility = problem.eligibility(mode)
+    lesson_masks = {}
+    for c_id, crs_id, t_id, count in problem.lessons:
+        m = eligibility.mask(problem.course_names[crs_id], problem.teacher_names[t_id])
+        if not m:
+            hints.append(f"🔴 {problem.class_names[c_id]} - {problem.course_names[crs_id]}: Uygun derslik yok ({count} saat yerleşemez)\n   💡 ÖNERİ: Derslik branş/öğretmen/ders kısıtlarını kontrol edin.")
+        elif mode == "room":
+            lesson_masks[(c_id, crs_id, t_id, count)] = m
+
+    if lesson_masks:
+        room_list = eligibility.rooms
+        flow = max_flow.SimpleMaxFlow()
+        source, sink = 0, 1
+        lesson_keys = list(lesson_masks)
+        room_node = lambda i: 2 + len(lesson_keys) + i
+        demand = 0
+        for k, key in enumerate(lesson_keys):
+            flow.add_arc_with_capacity(source, 2 + k, key[3])
+            demand += key[3]
+            for i in range(len(room_list)):
+                if lesson_masks[key] >> i & 1:
+                    flow.add_arc_with_capacity(2 + k, room_node(i), key[3])
+        room_caps = [problem.room_capacity[problem.room_id[r]] * weekly_slots if r in problem.room_id else weekly_slots for r in room_list]
+        for i, cap in enumerate(room_caps):
+            flow.add_arc_with_capacity(room_node(i), sink, cap)
+
+        if flow.solve(source, sink) == flow.OPTIMAL and flow.optimal_flow() < demand:
+            # Kaynak tarafındaki dersler, yine kaynak tarafındaki (doymuş) dersliklerin dışına çıkamaz
+            cut = set(flow.get_source_side_min_cut())
+            group = [r for i, r in enumerate(room_list) if room_node(i) in cut]
+            group_demand = sum(key[3] for k, key in enumerate(lesson_keys) if 2 + k in cut)
+            group_cap = sum(cap for i, cap in enumerate(room_caps) if room_node(i) in cut)
+            hints.append(f"🔴 Derslik grubu ({', '.join(group)}): Bu dersliklere sığmak zorunda olan ders yükü {group_demand} > Haftalık kapasite {group_cap} (Eksik: {demand - flow.optimal_flow()} saat)\n   💡 ÖNERİ: Derslik ekleyin, kapasiteyi artırın veya derslik kısıtlarını gevşetin.")
+
+    # 4. Günlük Blok Yerleşimi
+    day_runs = {} # öğretmen_id -> gün başına en uzun kesintisiz müsait aralık
+    for c_id, crs_id, t_id, count in problem.lessons:
+        if t_id not in day_runs:
+            runs = []
+            for d_idx, d in enumerate(days):
+                best = run = 0
+                for h in problem.hours:
+                    open_ = h != problem.lunch_break_hour and not problem.is_blocked(t_id, d_idx, h)
+                    run = run + 1 if open_ else 0
+                    best = max(best, run)
+                runs.append(best)
+            day_runs[t_id] = runs
+
+        blk = problem.course_block_size[crs_id]
+        if blk > 1:
+            allowed = set(block_durations(problem, crs_id, count)) # İzin verilen günlük süreler (bkz. 12. kısıt)
+        else:
+            allowed = set(range(0, count + 1))
+
+        # Günlere dağıtılabilen toplamlar (küçük sırt çantası)
+        reachable = {0}
+        for run in day_runs[t_id]:
+            reachable = {s + x for s in reachable for x in allowed if x <= run and s + x <= count}
+        if count not in reachable:
+            best = max(reachable)
+            reason = f"{blk} saatlik bloklar" if blk > 1 else "Günlük kesintisiz aralıklar"
+            hints.append(f"🔴 {problem.class_names[c_id]} - {problem.course_names[crs_id]}: Haftalık {count} saatin en fazla {best} saati yerleşebilir ({reason}, Öğretmen: {problem.teacher_names[t_id]})\n   💡 ÖNERİ: Öğretmenin kısıtlı saatlerini/izin günlerini azaltın veya blok süresini değiştirin.")
+
+    return hints
+
+
+def with_warnings(result, warnings):
+    """Ön kontrol uyarılarını (engellemeyen sorunlar) bir çözüm sonucunun mesajına ekler."""
+    schedule, msg, violations = result
+    if schedule and warnings:
+        msg += "\n\n⚠️ Ön Kontrol Uyarıları:\n" + "\n".join(warnings)
+    return schedule, msg, violations
+
+
+# Çözücü performans profilleri (okul ayarlarında lesson_config["solver_profile"] ile seçilir)
+#   time_limit: Süre limiti (sn), workers: Paralel arama iş parçacığı (None: işlemciye ayrılan çekirdek sayısı),
+#   presolve_iterations: Ön çözüm (presolve) tur sayısı, linearization: Doğrusallaştırma seviyesi (0-2),
+#   gap: Göreli boşluk limiti (amaç ile üst sınır arasındaki fark bu orana inince arama durur)
+#   seed: Rastgele tohum, branching: Arama dallanma stratejisi (bkz. SEARCH_BRANCHING). İkisi de isteğe bağlıdır
+#       (portföy çözümünde süreçleri çeşitlendirmek için kullanılır, bkz. PORTFOLIO_VARIANTS).
+SOLVER_PROFILES = {
+    "draft": {"label": "Taslak (Hızlı)", "time_limit": 15.0, "workers": None, "presolve_iterations": 1, "linearization": 0, "gap": 0.05},
+    "balanced": {"label": "Dengeli", "time_limit": 60.0, "workers": None, "presolve_iterations": 3, "linearization": 1, "gap": 0.01},
+    "thorough": {"label": "Kapsamlı (Yavaş)", "time_limit": 300.0, "workers": None, "presolve_iterations": 3, "linearization": 2, "gap": 0.0},
+}
+DEFAULT_SOLVER_PROFILE = "balanced"
+# Dallanma stratejileri (profilde "branching")
+SEARCH_BRANCHING = {
+    "automatic": cp_model.AUTOMATIC_SEARCH,
+    "fixed": cp_model.FIXED_SEARCH,
+    "portfolio": cp_model.PORTFOLIO_SEARCH,
+    "lp": cp_model.LP_SEARCH,
+    "pseudo_cost": cp_model.PSEUDO_COST_SEARCH,
+    "quick_restart": cp_model.PORTFOLIO_WITH_QUICK_RESTART_SEARCH,
+}
+
+
+def available_cpu_count():
+    """Bu işleme gerçekten ayrılmış çekirdek sayısı (CPU affinity / konteyner sınırları gözetilir)."""
+    try:
+        return max(1, len(os.sched_getaffinity(0)))
+    except (AttributeError, OSError):
+        return max(1, os.cpu_count() or 1)
+
+
+def set_search_workers(solver, workers=None):
+    """
+    Paralel arama iş parçacığı sayısı (None: işlemciye ayrılan çekirdek sayısı, en az 1). Tek iş parçacığında
+    CP-SAT'ın arama stratejileri (alt çözücüler) aynı iş parçacığında sırayla çalıştırılır (interleave_search);
+    tek başına varsayılan arama bu modelde çoğu zaman süre limitinde çözüm bulamaz.
+    """
+    workers = max(1, safe_int(workers, 0) or available_cpu_count())
+    solver.parameters.num_search_workers = workers
+    solver.parameters.interleave_search = workers == 1
+
+
+def apply_solver_profile(solver, profile=None, time_limit=None):
+    """
+    Profil ayarlarını CpSolver parametrelerine uygular. profile: Profil adı veya ayar sözlüğü
+    (eksik alanlar varsayılan profilden alınır). time_limit verilirse profil süresinden kısa olan kullanılır.
+    """
+    settings = dict(SOLVER_PROFILES[DEFAULT_SOLVER_PROFILE])
+    if isinstance(profile, dict):
+        settings.update(profile)
+    elif profile in SOLVER_PROFILES:
+        settings.update(SOLVER_PROFILES[profile])
+    limit = float(settings["time_limit"])
+    if time_limit is not None:
+        limit = min(limit, time_limit)
+    solver.parameters.max_time_in_seconds = limit
+    set_search_workers(solver, settings.get("workers"))
+    solver.parameters.max_presolve_iterations = safe_int(settings.get("presolve_iterations"), 3)
+    solver.parameters.linearization_level = safe_int(settings.get("linearization"), 1)
+    solver.parameters.relative_gap_limit = float(settings.get("gap") or 0.0)
+    if settings.get("seed") is not None:
+        solver.parameters.random_seed = safe_int(settings["seed"], 0)
+    if settings.get("branching") in SEARCH_BRANCHING:
+        solver.parameters.search_branching = SEARCH_BRANCHING[settings["branching"]]
+    return settings
+
+
+# Blok ders modelleri (okul ayarlarında lesson_config["block_model"] ile seçilir, bkz. create_timetable)
+BLOCK_MODELS = {
+    "hourly": "Saatlik Model (Varsayılan)",
+    "interval": "Blok Başlangıç Modeli (Blok tek derslikte)",
+}
+DEFAULT_BLOCK_MODEL = "hourly"
+
+
+REPAIR_MAX_DEPTH = 3 # Onarım bölgesi en fazla bu kadar adım genişletilir
+REPAIR_TIME_LIMIT = 10.0 # Onarım modunda her turun süre limiti (sn)
+
+
+def create_timetable(teachers, courses, classes, class_lessons, assignments, rooms, room_capacities=None, room_branches=None, room_teachers=None, room_courses=None, room_excluded_courses=None, mode="class", lunch_break_hour=None, num_hours=8, simultaneous_lessons=None, min_daily_hours=2, progress_callback=None, room_engine="joint", pool_rooms=True, lean_build=True, name_variables=True, problem=None, hint_schedule=None, repair_schedule=None, repair_teachers=None, repair_classes=None, repair_depth=1, pinned_lessons=None, incumbent_callback=None, stop_event=None, solver_profile=None, objective_mode="weighted", draft=False, precheck=True, block_model=DEFAULT_BLOCK_MODEL, block_no_overlap=False, decompose=True, hierarchical=None, grade_groups=None, repair_time_limit=REPAIR_TIME_LIMIT, portfolio=1, portfolio_target=None, symmetry_breaking=True):
     """
     mode: "class" (Sınıf bazlı dağıtım) veya "room" (Derslik bazlı dağıtım)
+    room_engine: Derslik bazlı modda çözüm yöntemi.
+        "joint": Saat ve derslik seçimi tek modelde.
+        "two_phase": 1. aşamada dersler saatlere yerleşir (derslik gruplarının toplam kapasitesi gözetilir),
+                     2. aşamada her saat diliminde derslikler akış (eşleştirme) ile atanır.
+                     2. aşama başarısız olursa "joint" modele geri dönülür.
+    pool_rooms: Birleşik derslik modelinde birbirinin aynısı olan derslikleri (kapasite, branş, öğretmen,
+        ders ve yasaklı ders listeleri aynı) tek bir havuz olarak modelle; çözüm sonrası havuzu dersliklere dağıt.
+    lean_build: Yalın model kurulumu (AddAtMostOne/AddExactlyOne, LinearExpr.Sum, öğretmen-gün başına tek
+        tercih ihlali sayacı). False verilirse eski (Python sum() tabanlı) kurulum kullanılır.
+    name_variables: False verilirse değişkenler isimsiz oluşturulur (daha az bellek, daha hızlı kurulum).
+    problem: Önceden oluşturulmuş ProblemModel (problem.get_problem). Verilmezse girdilerden oluşturulur
+        (aynı veri sürümü için önbellekten gelir).
+    hint_schedule: Önceki program (last_schedule). Verilirse çözücüye başlangıç ipucu (AddHint) olarak
+        verilir; küçük değişikliklerden sonra iyi bir çözüme çok daha hızlı ulaşılır. Artık olmayan
+        sınıf/ders/derslik kayıtları yok sayılır.
+    repair_schedule: Onarım modu. Verilirse önceki programın (last_schedule) etkilenen bölge dışındaki dersleri
+        sabitlenir, sadece o bölge yeniden çözülür. Etkilenen dersler: Önceki yerleşimi artık geçersiz olanlar
+        (saat sayısı değişmiş, öğretmen o saatte kapalı, derslik uygun değil, yeni ders) ve repair_teachers /
+        repair_classes listelerindeki öğretmen ve sınıfların dersleri. Bunlarla aynı sınıfı veya öğretmeni
+        paylaşan dersler de repair_depth adım boyunca bölgeye katılır. Bölgede eksik ders kalırsa bölge
+        REPAIR_MAX_DEPTH adıma kadar genişletilir; çözüm bulunamazsa tam çözüme (ipuçlu) geçilir.
+    repair_time_limit: Onarım modunda her turun süre limiti (sn, profil süresinden kısa olan kullanılır).
+    pinned_lessons: Manuel düzenleme ekranında sabitlenen hücreler [{"Sınıf", "Ders", "Gün", "Saat", "Derslik"}, ...].
+        Sabit ders saati 1'e sabitlenir; o saatte dersin diğer derslik değişkenleri ve aynı öğretmenin /
+        sınıfın diğer dersleri için değişken oluşturulmaz. Geçersiz kalan (ders silinmiş, öğretmen o saatte
+        kapalı, derslik uygun değil veya dolu, blok süresi / tek parça kuralına uymuyor) sabitlemeler yok sayılır
+        ve mesajda listelenir. Kalan sabitlemeler yine de birlikte çelişirse program sabitlemeler olmadan kurulur.
+    incumbent_callback: Arama sırasında her yeni çözümde çağrılır (bkz. IncumbentCallback). Çözücünün
+        iş parçacığından çağrıldığı için arayüz güncellemesi çağıranın kendi iş parçacığında yapılmalıdır.
+    stop_event: threading.Event. Başka bir iş parçacığından işaretlendiğinde arama durdurulur ve o ana kadar
+        bulunan en iyi program (ihlal listesiyle) normal yoldan döner. Durdurulduktan sonra onarım bölgesi
+        genişletilmez ve birleşik modele geri dönülmez.
+    solver_profile: Çözücü profili ("draft", "balanced", "thorough" veya ayar sözlüğü, bkz. SOLVER_PROFILES).
+        Süre limiti, iş parçacığı sayısı, presolve/doğrusallaştırma seviyesi ve göreli boşluk limitini belirler.
+    objective_mode: "weighted" (tek ağırlıklı amaç) veya "lexicographic" (aşamalı: Önce yerleşen ders saati
+        maksimize edilir, değeri sabitlenir; sonra öğretmen günlük limit, ders günlük limit, tercih ihlalleri ve
+        kalan kurallar sırayla minimize edilir, bkz. LEXICOGRAPHIC_TIERS). Her aşama süre limitinin bir payını
+        kullanır; mesajda hangi aşamanın kanıtlanmış optimum olduğu raporlanır.
+    draft: Taslak mod ("Her şey sığıyor mu?" kontrolü). Sadece kesin kurallar: Yumuşak kurallar (öğretmen ve ders
+        günlük limitleri (6, 8), tercih (14), günlük minimum (17), derslik dengesi) eklenmez, amaç sadece yerleşen
+        ders saatidir. Arama tüm ders saatlerinin yerleştiği ilk çözümde durdurulur.
+        Profil verilmezse "draft" profili kullanılır.
+    block_model: Blok dersler (block_size > 1) için model. "hourly": Saatlik değişkenler + süreklilik için
+        active/start yardımcıları (7) ve günlük süre alanı (12). "interval": Blok başlangıçları (isteğe bağlı
+        aralıklar) doğrudan seçilir, yardımcı değişken ve süre alanı gerekmez (12). Davranış farkı: Blok bir günde
+        tek derslik sütununda (derslik veya havuz) yapılır, saatlik modelde saatler arasında derslik değişebilir.
+        Varsayılan "hourly" (önceki formülasyon).
+    block_no_overlap: "interval" modelinde ek (gereksiz/redundant) zamanlama kısıtları: Blok dersi olan
+        öğretmen/sınıflar için AddNoOverlap, derslikler için AddNoOverlap/AddCumulative (13). Örnek okul verisinde
+        aramayı yavaşlattığı için varsayılan kapalıdır.
+    decompose: Okul birbirinden bağımsız bölümlere (ortak öğretmen/sınıf/derslik yok) ayrılıyorsa her bölüm ayrı
+        bir CP modeli olarak süreç havuzunda paralel çözülür, programlar ve ihlal listeleri birleştirilir. Bölüm sayısı
+        çekirdek sayısını aşarsa ayrıştırma yapılmaz (tek model).
+    hierarchical: Seviye seviye çözüm (bkz. solve_by_grades). None ise sınıf sayısı HIERARCHICAL_MIN_CLASSES ve
+        üzerindeyse otomatik açılır. Her adımda bir sınıf seviyesi eklenir, önceki seviyelerin yerleşimleri sabittir
+        (öğretmen ve derslik saatleri dolu sayılır); sonunda komşu seviyelerin sınırları birlikte iyileştirilir.
+    grade_groups: Sınıf -> seviye adı sözlüğü. Verilmeyen sınıfların seviyesi adından çıkarılır (bkz. class_grade).
+    portfolio: Aynı modeli farklı tohum, dallanma stratejisi ve formülasyonlarla (bkz. PORTFOLIO_VARIANTS) ayrı
+        süreçlerde çözen süreç sayısı; en iyi program seçilir (bkz. solve_portfolio). Varsayılan 1 (kapalı); "auto"
+        ise çekirdek sayısına göre (her sürece PORTFOLIO_RUN_WORKERS çekirdek). Onarım modunda kullanılmaz.
+    portfolio_target: Portföyde hedef: Bir süreç tüm ders saatlerini yerleştirip en fazla bu kadar kural ihlali
+        olan bir program bulduğunda tüm süreçler durdurulur (None: hedef yok, optimumu kanıtlayan ilk süreç durdurur).
+    symmetry_breaking: Birbirinin yerine geçebilen ders kopyaları ve havuzlanmamış özdeş derslikler için sıralama
+        kısıtları (18). Simetrik çözümler elenir; imkansızlık ispatı ve optimallik boşluğu daha hızlı kapanır.
+        hint_schedule verildiğinde (ve onarım modunda) uygulanmaz.
+    precheck: Model kurulmadan önce gerekli koşul kontrolü (bkz. feasibility_precheck). Varsayılan (True) uyarı
+        niteliğindedir: Tüm derslerin yerleşmesi imkansız olsa da çözücü yerleşebilen en fazla dersle bir program
+        üretir, sorunlar sonuç mesajına eklenir. "strict" ise sorun varsa model kurulmaz, sorunlar hemen raporlanır.
+        False ise kontrol atlanır.
     """
+    call_args = dict(locals()) # Geri dönüş (fallback) çağrıları için orijinal argümanlar
     model = cp_model.CpModel()
-    penalties = [] # Yumuşak kısıtlamalar için ceza listesi
+    penalties = [] # Yumuşak kısıtlamalar için ceza listesi: (değişken, ağırlık)
     penalty_tracking = [] # İhlalleri raporlamak için (Variable, Description Template)
+    missing_vars = {} # ders satırı -> eksik saat değişkeni
     
-    def safe_int(val, default):
-        try:
-            if val is None: return default
-            if isinstance(val, float) and val != val: return default
-            return int(val)
-        except:
-            return default
-
     # Girdi Temizliği (TypeError önlemek için)
     min_daily_hours = safe_int(min_daily_hours, 2)
-    
-    # class_lessons temizliği (Sayısal değerleri garantiye al)
-    clean_class_lessons = {}
-    for c, c_lessons in class_lessons.items():
-        clean_class_lessons[c] = {}
-        if c_lessons:
-            for crs, cnt in c_lessons.items():
-                clean_class_lessons[c][crs] = safe_int(cnt, 0)
-    class_lessons = clean_class_lessons
-
-    # Veri Temizliği: Oda-Öğretmen eşleşmelerindeki isimleri temizle
+    lunch_break_hour = safe_int(lunch_break_hour, None)
+    num_hours = safe_int(num_hours, 8)
+
+    # Veri Temizliği: İsimler, sayısal değerler ve "Gün:Saat" kısıtları veri sürümü başına bir kez çözümlenir
     if progress_callback: progress_callback(5, "Veriler hazırlanıyor ve değişkenler oluşturuluyor...")
-    
-    if room_teachers:
-        room_teachers = {r: [str(t).strip() for t in ts] for r, ts in room_teachers.items()}
+    if problem is None:
+        problem = get_problem(
+            teachers, courses, classes, class_lessons, assignments, rooms, room_capacities=room_capacities,
+            room_branches=room_branches, room_teachers=room_teachers, room_courses=room_courses,
+            room_excluded_courses=room_excluded_courses, lunch_break_hour=lunch_break_hour, num_hours=num_hours
+        )
+    class_lessons = problem.class_lessons
+    assignments = problem.assignments
 
-    # --- Değişkenler ---
-    # lessons[(sınıf, ders, öğretmen, derslik, gün, saat)] = 1/0
-    lessons = {}
-    days = ["Pazartesi", "Salı", "Çarşamba", "Perşembe", "Cuma"]
-    hours = range(1, num_hours + 1) # Günde num_hours kadar saat
+    # --- Ön Kontrol (Gerekli Koşullar) ---
+    # Kesin imkansızlıklar (kapasite, derslik akışı, blok yerleşimi) model kurulmadan milisaniyeler içinde bulunur.
+    # Varsayılan olarak engellemez (eksik derslerle yine de program üretilir), sonuç mesajına eklenir; sadece
+    # precheck="strict" ise çözücü hiç çalıştırılmaz. Kesin olmayan sorunlar (örn. öğretmen günlük limiti) hep uyarıdır.
+    precheck_warnings = []
+    if precheck:
+        check_start = time.perf_counter()
+        hints = feasibility_precheck(problem, mode, simultaneous_lessons, warnings=precheck_warnings)
+        if hints and precheck != "strict":
+            precheck_warnings[:0] = ["Tüm ders saatleri yerleşemez, yerleşebilen en fazla ders dağıtıldı:"] + hints
+        elif hints:
+            elapsed_ms = (time.perf_counter() - check_start) * 1000
+            msg = f"Program oluşturulamaz: Ön kontrol tüm derslerin yerleşemeyeceğini gösterdi ({elapsed_ms:.0f} ms, model kurulmadı)."
+            msg += "\n\n🔍 Sorunlar:\n" + "\n".join(hints)
+            return [], msg, []
 
-    # Veri hazırlığı
-    # assignments: {'9-A': {'Matematik': 'Ahmet Hoca', ...}}
-    
-    # Tüm olası kombinasyonlar için değişken oluştur
-    
-    # --- Yardımcı: Ders Özelliklerini Çözümle (Etiketli dersler için) ---
-    course_def_map = {}
-    if courses:
-        for c in courses:
-            if isinstance(c, dict) and c.get('name'):
-                course_def_map[c['name']] = c
-    
-    def get_base_name(crs_name):
-        if crs_name in course_def_map:
-            return crs_name
-        if " (" in crs_name and crs_name.endswith(")"):
-            base = crs_name.rsplit(" (", 1)[0]
-            if base in course_def_map:
-                return base
-        return crs_name
-
-    def get_course_prop(crs_name, prop, default=None):
-        base = get_base_name(crs_name)
-        if base in course_def_map:
-            return course_def_map[base].get(prop, default)
-        return default
-
-    # --- Yardımcı Fonksiyon: Uygun Odaları Bul ---
-    def get_allowed_rooms(crs_name, t_name):
-        base_crs_name = get_base_name(crs_name)
-        
-        # 1. Zorunlu Oda Kontrolü
-        forced_room = get_course_prop(crs_name, 'specific_room')
-        if forced_room and forced_room in rooms:
-            return [forced_room]
-        
-        # 2. Aday Odaları Filtrele
-        candidates = rooms if rooms else ["Varsayilan_Derslik"]
-        
-        # Yasaklı Ders Kontrolü: Eğer ders bu oda için yasaklıysa adaylardan çıkar
-        if room_excluded_courses:
-            candidates = [r for r in candidates if crs_name not in room_excluded_courses.get(r, []) and base_crs_name not in room_excluded_courses.get(r, [])]
-            
-        allowed = []
-        crs_branch = get_course_prop(crs_name, 'branch')
-        clean_crs_branch = str(crs_branch).strip() if crs_branch else ""
-        
-        # Pass 1: Strict Check (Branch + Teacher)
-        for r in candidates:
-            # 1. Ders Kısıtlaması (Varsa kesin uyulmalı)
-            r_courses = room_courses.get(r, []) if room_courses else []
-            is_course_explicit = False
-            if r_courses:
-                if crs_name not in r_courses and base_crs_name not in r_courses:
-                    continue # Bu oda bu ders için yasak (Listede yok)
-                is_course_explicit = True # Ders açıkça bu odaya tanımlanmış
-
-            # Öğretmen Kısıtlaması
-            r_teachers = room_teachers.get(r, []) if room_teachers else []
-            if r_teachers and t_name not in r_teachers:
+    # --- Bağımsız Bölümler (Bileşen Ayrıştırma) ---
+    # Ortak öğretmeni, sınıfı (ve derslik modunda dersliği) olmayan bölümler ayrı modeller olarak paralel süreçlerde
+    # çözülür; süre en büyük bölüme göre belirlenir (bkz. solve_components). Çekirdek sayısı bölüm sayısından azsa
+    # süreçler aynı çekirdekleri paylaşıp birbirini yavaşlatacağından okul tek model olarak çözülür.
+    if decompose:
+        components = lesson_components(problem, mode)
+        if 1 < len(components) <= available_cpu_count():
+            return with_warnings(solve_components(call_args, components, problem), precheck_warnings)
+
+    # --- Seviye Seviye Çözüm (Hiyerarşik Ayrıştırma) ---
+    # Çok büyük okullarda tek model süre limitinde yakınsamaz: Sınıf seviyeleri sırayla eklenir (bkz. solve_by_grades).
+    if repair_schedule is None and (hierarchical or (hierarchical is None and len(problem.class_names) >= HIERARCHICAL_MIN_CLASSES)):
+        levels = grade_levels(problem, grade_groups)
+        if len(levels) > 1:
+            return with_warnings(solve_by_grades(call_args, levels, problem), precheck_warnings)
+
+    # --- Süreç Portföyü ---
+    # CP-SAT'ın iş parçacıkları tek süreçte tek ayar setiyle çalışır. Çok çekirdekli sunucularda aynı okul farklı
+    # tohum/strateji/formülasyonla ayrı süreçlerde de çözülür (bkz. solve_portfolio). Sadece istenirse açılır.
+    runs = available_cpu_count() // PORTFOLIO_RUN_WORKERS if portfolio == "auto" else safe_int(portfolio, 1)
+    if repair_schedule is None and runs > 1:
+        return with_warnings(solve_portfolio(call_args, problem, runs), precheck_warnings)
+
+    days = problem.days
+    hours = problem.hours # Günde num_hours kadar saat
+
+    # --- Model Kurulum Yardımcıları (Yalın / Eski yol) ---
+    nm = name_variables # Kısaltma: f"..." if nm else "" -> isimsiz modda metin hiç oluşturulmaz
+
+    def linear_sum(items):
+        return cp_model.LinearExpr.Sum(items) if lean_build else sum(items)
+
+    def add_at_most_one(literals):
+        if lean_build:
+            model.AddAtMostOne(literals)
+        else:
+            model.Add(sum(literals) <= 1)
+
+    # --- Derslik Uygunluk Matrisi ---
+    # Uygun odalar her (ders, öğretmen) çifti için bir kez derlenir, kısıtlama bölümleri bu matristen okur.
+    eligibility = problem.eligibility(mode)
+    get_allowed_rooms = eligibility.allowed_rooms
+
+    two_phase = mode == "room" and room_engine == "two_phase"
+    room_free = mode != "room" or two_phase
+
+    # --- Derslik Havuzları ---
+    # Birbirinin yerine geçebilen derslikler tek kaynak (toplam kapasite) olarak modellenir.
+    # Bu sayede değişken sayısı azalır ve simetrik çözümler aranmaz.
+    room_pool_of = {} # derslik -> havuz adı (havuzun ilk dersliği)
+    room_pools = {} # havuz adı -> üye derslikler
+    if mode == "room" and not two_phase:
+        pool_list = detect_room_pools(
+            eligibility.rooms, courses, room_capacities=room_capacities, room_branches=room_branches,
+            room_teachers=room_teachers, room_courses=room_courses, room_excluded_courses=room_excluded_courses
+        ) if pool_rooms else [[r] for r in eligibility.rooms]
+        for members in pool_list:
+            room_pools[members[0]] = members
+            for r_name in members:
+                room_pool_of[r_name] = members[0]
+
+    # --- Alan Budama (Domain Pruning) ---
+    # Öğretmen izin günleri/saatleri (bit maskesi) ve öğle arası için değişken hiç oluşturulmaz.
+    # Böylece ölü değişkenler ve "== 0" kısıtları modele (ve presolve'a) hiç girmez. (bkz. problem.open_slots)
+
+    # --- Değişken Tensörü ---
+    # var_index[ders satırı, derslik sütunu, gün, saat - 1] = lesson_vars içindeki sıra (-1: değişken yok)
+    # Ders satırı problem.lessons sırasıdır. Derslik sütunları: Havuzlar (birleşik derslik modeli) veya
+    # tek bir "dersliksiz" sütun (sınıf modu / iki aşamalı model).
+    # Öğretmen/gün, sınıf/saat, derslik/saat gibi toplamalar tensör dilimleriyle yapılır.
+    room_axis = [None] if room_free else list(room_pools)
+    room_col = {r_name: i for i, r_name in enumerate(room_axis)}
+    var_index = np.full((len(problem.lessons), len(room_axis), len(days), num_hours), -1, dtype=np.int32)
+    lesson_vars = [] # Ders değişkenleri (1: Ders o derslikte o saatte yapılıyor)
+    lesson_masks = {} # ders satırı -> uygun derslik bit kümesi
+    block_intervals = {} # ders satırı -> [(derslik sütunu, isteğe bağlı aralık), ...] (block_model="interval")
+
+    def pick(index_block):
+        """Tensör dilimindeki (var_index[...]) mevcut değişkenler."""
+        return [lesson_vars[i] for i in index_block[index_block >= 0].tolist()]
+
+    # Eş zamanlı ders grupları (Sınıf bölme): Her grup tek bir zamanlama birimidir (bkz. 15).
+    # Grup üyeleri sınıf çakışmasına sadece lider üzerinden girer, çünkü aynı anda yapılmalarına izin veriyoruz.
+    group_leader = {a: group[0] for group in simultaneous_groups(problem, simultaneous_lessons) for a in group[1:]}
+
+    class_rows = defaultdict(list) # sınıf_id -> ders satırları (eş zamanlı grupların sadece lideri)
+    teacher_rows = defaultdict(list) # öğretmen_id -> ders satırları
+    lesson_domains = [] # ders satırı -> (derslik sütunları, açık (gün, saat) listesi)
+
+    # Sadece öğretmeni atanmış ve saati > 0 olan dersler (problem.lessons)
+    for a, (c_id, crs_id, t_id, count) in enumerate(problem.lessons):
+        c_name = problem.class_names[c_id]
+        crs_name = problem.course_names[crs_id]
+        t_name = problem.teacher_names[t_id]
+        teacher_rows[t_id].append(a)
+        if a not in group_leader:
+            class_rows[c_id].append(a)
+
+        available_rooms = get_allowed_rooms(crs_name, t_name)
+        # Sınıf modunda derslik kapasitesi kısıtlanmadığı için derslik boyutu modele girmez:
+        # Değişkenler (sınıf, ders, gün, saat) üzerinden kurulur, derslikler çözümden sonra atanır.
+        # İki aşamalı derslik modunda da 1. aşama aynı şekilde derslik boyutu olmadan kurulur.
+        if room_free:
+            available_rooms = [None] if available_rooms else []
+        else:
+            available_rooms = list(dict.fromkeys(room_pool_of[r] for r in available_rooms))
+
+        if available_rooms:
+            lesson_masks[a] = eligibility.mask(crs_name, t_name)
+
+        lesson_slots = [(days.index(d), h - 1) for d, h in problem.open_slots(t_id)]
+        lesson_domains.append(([room_col[r_name] for r_name in available_rooms], lesson_slots))
+
+    # Grubun ortak saatleri: Tüm üyelerin (öğretmenlerinin) açık olduğu saatler
+    group_members = defaultdict(list) # lider satırı -> üye satırları (lider hariç)
+    for a, leader in group_leader.items():
+        group_members[leader].append(a)
+    for leader, members in group_members.items():
+        common = set(lesson_domains[leader][1])
+        for a in members:
+            common &= set(lesson_domains[a][1])
+        for a in [leader] + members:
+            r_cols, lesson_slots = lesson_domains[a]
+            lesson_domains[a] = (r_cols, [slot for slot in lesson_slots if slot in common])
+
+    # --- Onarım Modu (Yerel Yeniden Çözüm) ---
+    # Etkilenen bölge dışındaki derslerin önceki yerleşimleri 1'e sabitlenir ve diğer saatleri için değişken hiç
+    # açılmaz. Önceki yerleşimi tam ve geçerli olmayan her ders (yeni, saati değişmiş, eksik kalmış) bölgeye girer.
+    fixed_slots = {} # ders satırı -> {(derslik sütunu, gün, saat - 1), ...}
+    if repair_schedule is not None:
+        placements = previous_placements(problem, repair_schedule, room_col, room_pool_of)
+        repair_teachers = {str(t).strip() for t in repair_teachers or []}
+        repair_classes = set(repair_classes or [])
+        seed_rows = set()
+        for a, (c_id, crs_id, t_id, count) in enumerate(problem.lessons):
+            r_cols, lesson_slots = lesson_domains[a]
+            slots = placements.get(a, set())
+            # Yeni ders (önceki programda yok), saati değişmiş veya eksik kalmış ders ya da geçersiz yerleşim
+            valid = len(slots) == count and all(
+                r_col in r_cols and (d_idx, h_idx) in lesson_slots for r_col, d_idx, h_idx in slots
+            )
+            if not valid or problem.teacher_names[t_id] in repair_teachers or problem.class_names[c_id] in repair_classes:
+                seed_rows.add(a)
+        free_rows = repair_neighborhood(problem, seed_rows, repair_depth)
+        fixed_slots = {a: placements[a] for a in range(len(problem.lessons)) if a not in free_rows}
+        if hint_schedule is None:
+            hint_schedule = repair_schedule # Bölgedeki dersler için önceki yerleşim ipucu olur
+
+    # --- Sabitlenmiş Dersler (Manuel Düzenleme) ---
+    # Sabit saatler ders satırı başına (gün, saat - 1) -> derslik sütunu (None: derslik serbest) olarak tutulur.
+    # O saatte aynı öğretmenin ve sınıfın diğer dersleri için değişken açılmaz. Kesin kurallarla çelişen sabitlemeler
+    # (öğretmen/sınıf çakışması, derslik kapasitesi, tek parça (7) ve blok süresi (12)) yok sayılır ve raporlanır.
+    pin_slots = defaultdict(dict)
+    busy_teacher, busy_class = set(), set()
+    busy_room = defaultdict(int) # (derslik sütunu, gün, saat - 1) -> sabit ders sayısı (birleşik derslik modeli)
+    ignored_pins = [] # Yok sayılan sabitlemeler (mesajda raporlanır)
+
+    def pin_label(a, d_idx, h_idx, reason):
+        c_id, crs_id, _, _ = problem.lessons[a]
+        return f"{problem.class_names[c_id]} - {problem.course_names[crs_id]} - {days[d_idx]} {h_idx + 1}. saat ({reason})"
+
+    def pool_capacity(r_col):
+        return sum(_room_capacity(room_capacities, m) for m in room_pools[room_axis[r_col]])
+
+    for a, slots in previous_placements(problem, pinned_lessons, room_col, room_pool_of).items():
+        c_id, crs_id, t_id, count = problem.lessons[a]
+        r_cols, lesson_slots = lesson_domains[a]
+        class_conflict = a not in group_leader
+        for r_col, d_idx, h_idx in sorted(slots, key=lambda s: (s[1], s[2])):
+            if len(pin_slots[a]) >= count:
+                ignored_pins.append(pin_label(a, d_idx, h_idx, "haftalık ders saatinden fazla"))
+            elif (d_idx, h_idx) not in lesson_slots or (r_col is not None and r_col not in r_cols):
+                ignored_pins.append(pin_label(a, d_idx, h_idx, "saat kapalı veya derslik uygun değil"))
+            elif (t_id, d_idx, h_idx) in busy_teacher or (class_conflict and (c_id, d_idx, h_idx) in busy_class):
+                ignored_pins.append(pin_label(a, d_idx, h_idx, "öğretmen/sınıf çakışması"))
+            elif not room_free and r_col is not None and busy_room[(r_col, d_idx, h_idx)] >= pool_capacity(r_col):
+                ignored_pins.append(pin_label(a, d_idx, h_idx, f"{room_axis[r_col]} dolu"))
+            else:
+                pin_slots[a][(d_idx, h_idx)] = r_col
+                busy_teacher.add((t_id, d_idx, h_idx))
+                if class_conflict:
+                    busy_class.add((c_id, d_idx, h_idx))
+                if not room_free and r_col is not None:
+                    busy_room[(r_col, d_idx, h_idx)] += 1
+
+    # Günlük desen: Bir günün sabit saatleri, o gün tek parça (7) ve izin verilen sürede (12) bir derse
+    # tamamlanabilmeli; tamamlanan saatler toplamı haftalık saati aşmamalı. Tamamlanamayan günün sabitlemeleri düşer.
+    for a, pins in pin_slots.items():
+        c_id, crs_id, t_id, count = problem.lessons[a]
+        class_conflict = a not in group_leader
+        open_slots = set(lesson_domains[a][1])
+        blk = problem.course_block_size[crs_id]
+        sizes = [size for size in block_durations(problem, crs_id, count) if size > 0] if blk > 1 else None
+        needed = 0
+        for d_idx in sorted({d for d, _ in pins}):
+            day_hours = sorted(h for d, h in pins if d == d_idx)
+            first, last = day_hours[0], day_hours[-1]
+
+            def usable(h_idx, d_idx=d_idx):
+                if (d_idx, h_idx) in pins: return True
+                return (d_idx, h_idx) in open_slots and (t_id, d_idx, h_idx) not in busy_teacher and not (
+                    class_conflict and (c_id, d_idx, h_idx) in busy_class
+                )
+
+            if sizes is None:
+                need = last - first + 1 if all(usable(h) for h in range(first, last + 1)) else None
+            else:
+                fits = [
+                    size for size in sizes if any(
+                        all(usable(h) for h in range(start, start + size))
+                        for start in range(max(0, last - size + 1), min(first, num_hours - size) + 1)
+                    )
+                ]
+                need = min(fits) if fits else None
+                if block_model == "interval" and not room_free and len({pins[(d_idx, h)] for h in day_hours} - {None}) > 1:
+                    need = None # Başlangıç modelinde blok tek derslik sütununda yapılır
+            if need is not None and needed + need <= count:
+                needed += need
                 continue
-            
-            # Branş Kısıtlaması
-            r_branches = room_branches.get(r, []) if room_branches else []
-            # Veri temizliği (Boşluk hatalarını önlemek için)
-            r_branches = [str(b).strip() for b in r_branches]
-            
-            # Eğer oda öğretmene özelse VEYA ders açıkça izin verilmişse, branş kısıtlamasını es geç
-            is_teacher_room = t_name in r_teachers
-            
-            if r_branches and clean_crs_branch not in r_branches:
-                if not is_teacher_room and not is_course_explicit:
-                    continue
-            
-            allowed.append(r)
-            
-        # Pass 2: Fallback (Branch Only) - Eğer hiç oda bulunamazsa öğretmen kısıtlamasını esnet
-        if not allowed:
-            for r in candidates:
-                # Ders Kısıtlaması (Burada da geçerli olmalı)
-                r_courses = room_courses.get(r, []) if room_courses else []
-                is_course_explicit = False
-                if r_courses:
-                    if crs_name not in r_courses and base_crs_name not in r_courses:
-                        continue
-                    is_course_explicit = True
-
-                r_branches = room_branches.get(r, []) if room_branches else []
-                r_branches = [str(b).strip() for b in r_branches] # Temizlik
-                
-                if r_branches and clean_crs_branch not in r_branches:
-                    if not is_course_explicit: # Ders izinliyse branşa takılma
-                        continue
-                allowed.append(r)
-        
-        # Pass 3: Ultimate Fallback (Any Room) - Branş da uymuyorsa herhangi bir odayı aç
-        # Bu sayede dersin açıkta kalması engellenir.
-        if not allowed and mode == "class":
-            # Sadece kısıtlaması olmayan (Genel) veya dersin izinli olduğu odaları aç
-            for r in candidates:
-                r_courses = room_courses.get(r, []) if room_courses else []
-                if r_courses and (crs_name not in r_courses and base_crs_name not in r_courses):
-                    continue # Özel odaları koru
-                allowed.append(r)
-                
-        return allowed
+            for h_idx in day_hours:
+                r_col = pins.pop((d_idx, h_idx))
+                busy_teacher.discard((t_id, d_idx, h_idx))
+                if class_conflict:
+                    busy_class.discard((c_id, d_idx, h_idx))
+                if not room_free and r_col is not None:
+                    busy_room[(r_col, d_idx, h_idx)] -= 1
+                ignored_pins.append(pin_label(a, d_idx, h_idx, "blok süresi / tek parça kuralı"))
 
-    for c_name in classes:
-        if c_name not in class_lessons: continue
-        
-        for crs_name, count in class_lessons[c_name].items():
-            if count <= 0: continue
-            
-            # Bu dersin öğretmeni kim?
-            t_name = assignments.get(c_name, {}).get(crs_name)
-            if not t_name: continue # Öğretmen atanmamışsa atla
-            t_name = str(t_name).strip() # İsim temizliği (Boşlukları sil)
-            
-            available_rooms = get_allowed_rooms(crs_name, t_name)
+    # Dersliksiz modelde grup üyeleri liderin saat değişkenlerini paylaşır: Üyelerin öğretmenleri sabit bir
+    # dersteyse (üye o saatte sabitlenmemişse) liderin o saati hiç açılmaz.
+    shared_busy = defaultdict(set) # lider satırı -> {(gün, saat - 1), ...}
+    if room_free:
+        for leader, members in group_members.items():
+            for a in members:
+                t_id = problem.lessons[a][2]
+                for d_idx, h_idx in lesson_domains[a][1]:
+                    if (t_id, d_idx, h_idx) in busy_teacher and (d_idx, h_idx) not in pin_slots.get(a, {}):
+                        shared_busy[leader].add((d_idx, h_idx))
+
+    for a, (r_cols, lesson_slots) in enumerate(lesson_domains):
+        if room_free and a in group_leader: continue # Liderin değişkenleri paylaşılır (aşağıda)
+        c_id, crs_id, t_id, _ = problem.lessons[a]
+        fixed = fixed_slots.get(a)
+        prune = fixed is not None and len(fixed) >= problem.lessons[a][3]
+        pins = pin_slots.get(a, {})
+        class_conflict = a not in group_leader
+        for r_col in r_cols:
+            for d_idx, h_idx in lesson_slots:
+                if prune and (r_col, d_idx, h_idx) not in fixed: continue
+                if (d_idx, h_idx) in pins:
+                    if pins[(d_idx, h_idx)] not in (None, r_col): continue # Sabit derslik dışındaki alternatifler
+                elif (t_id, d_idx, h_idx) in busy_teacher or (class_conflict and (c_id, d_idx, h_idx) in busy_class):
+                    continue # Öğretmen/sınıf bu saatte sabit bir derste
+                elif (d_idx, h_idx) in shared_busy.get(a, ()):
+                    continue # Grup üyesinin öğretmeni bu saatte sabit bir derste
+                var_index[a, r_col, d_idx, h_idx] = len(lesson_vars)
+                var = model.NewBoolVar(
+                    f"lesson_{problem.class_names[c_id]}_{problem.course_names[crs_id]}_{problem.teacher_names[t_id]}"
+                    f"_{room_axis[r_col]}_{days[d_idx]}_{h_idx + 1}" if nm else ""
+                )
+                if (fixed is not None and (r_col, d_idx, h_idx) in fixed) or pins.get((d_idx, h_idx)) == r_col:
+                    model.Add(var == 1)
+                lesson_vars.append(var)
 
-            for r_name in available_rooms:
-                for d in days:
-                    for h in hours:
-                        lessons[(c_name, crs_name, t_name, r_name, d, h)] = model.NewBoolVar(
-                            f"lesson_{c_name}_{crs_name}_{t_name}_{r_name}_{d}_{h}"
-                        )
+    # --- Eş Zamanlı Ders Grupları (Ortak Zamanlama) ---
+    # Dersliksiz model: Üyelerin saat değişkenleri liderin değişkenleridir (aynı nesne, lesson_vars'ta ayrı sıra).
+    # Birleşik derslik modeli: Grup başına tek bir saat değişkeni (group_timing), her üye derslik seçimini
+    # bu değişkene bağlar (üyenin o saatteki derslik değişkenlerinin toplamı == grup saati).
+    group_timing = {} # ders satırı -> {(gün, saat - 1): ortak saat değişkeni} (birleşik derslik modeli)
+    for leader, members in group_members.items():
+        if room_free:
+            for a in members:
+                fixed = fixed_slots.get(a, set())
+                pins = pin_slots.get(a, {})
+                for d_idx, h_idx in np.argwhere(var_index[leader, 0] >= 0).tolist():
+                    if (d_idx, h_idx) not in lesson_domains[a][1]: continue
+                    var = lesson_vars[var_index[leader, 0, d_idx, h_idx]]
+                    var_index[a, 0, d_idx, h_idx] = len(lesson_vars)
+                    if (0, d_idx, h_idx) in fixed or (d_idx, h_idx) in pins:
+                        model.Add(var == 1)
+                    lesson_vars.append(var)
+            continue
+        timing = {}
+        rows = [leader] + members
+        for d_idx, h_idx in np.argwhere((var_index[rows] >= 0).any(axis=(0, 1))).tolist():
+            timing[(d_idx, h_idx)] = model.NewBoolVar(f"group_{problem.class_names[problem.lessons[leader][0]]}_{problem.course_names[problem.lessons[leader][1]]}_{days[d_idx]}_{h_idx + 1}" if nm else "")
+            for a in rows:
+                # sum(üye derslik değişkenleri) == grup saati  <=>  ExactlyOne(değişkenler + [¬grup saati])
+                model.AddExactlyOne(pick(var_index[a, :, d_idx, h_idx]) + [timing[(d_idx, h_idx)].Not()])
+        for a in rows:
+            group_timing[a] = timing
+
+    # Dersliği belirtilmemiş sabit saatler: Derslik alternatiflerinden tam olarak biri seçilir
+    for a, pins in pin_slots.items():
+        for (d_idx, h_idx), r_col in pins.items():
+            if r_col is None:
+                model.AddExactlyOne(pick(var_index[a, :, d_idx, h_idx]))
+
+    has_var = var_index >= 0
+    class_rows = {c_id: np.array(rows) for c_id, rows in class_rows.items()}
+    teacher_rows = {t_id: np.array(rows) for t_id, rows in teacher_rows.items()}
 
     # --- Kısıtlamalar ---
 
@@ -177,282 +1058,262 @@ def create_timetable(teachers, courses, classes, class_lessons, assignments, roo
     if lunch_break_hour:
         weekly_slots -= 5
 
-    for c_name in classes:
-        if c_name not in class_lessons: continue
-        
-        # Sınıfın toplam yükünü hesapla
-        total_class_load = sum(class_lessons[c_name].values())
-        
-        for crs_name, count in class_lessons[c_name].items():
-            t_name = assignments.get(c_name, {}).get(crs_name)
-            if not t_name: continue
-            
-            available_rooms = get_allowed_rooms(crs_name, t_name)
-            # Eğer sınıfın yükü kapasiteyi aşıyorsa, tam eşitlik yerine <= kısıtlaması koy (Çözüm bulabilmek için)
-            # Bu sayede "Çözüm Bulunamadı" yerine eksik dersli bir program çıkar.
-            lesson_vars = [
-                lessons[(c_name, crs_name, t_name, r_name, d, h)] 
-                for r_name in available_rooms
-                for d in days 
-                for h in hours
-                if (c_name, crs_name, t_name, r_name, d, h) in lessons
-            ]
+    for a, (c_id, crs_id, t_id, count) in enumerate(problem.lessons):
+        c_name = problem.class_names[c_id]
+        crs_name = problem.course_names[crs_id]
+        # Sınıfın toplam yükü
+        total_class_load = problem.class_load[c_id]
+
+        # Eğer sınıfın yükü kapasiteyi aşıyorsa, tam eşitlik yerine <= kısıtlaması koy (Çözüm bulabilmek için)
+        # Bu sayede "Çözüm Bulunamadı" yerine eksik dersli bir program çıkar.
+        weekly_vars = pick(var_index[a])
             
-            # Eğer uygun oda yoksa veya değişken oluşturulamadıysa kısıtlamayı atla (Hata vermemesi için)
-            if not lesson_vars: continue
+        # Eğer uygun oda yoksa veya değişken oluşturulamadıysa kısıtlamayı atla (Hata vermemesi için)
+        if not weekly_vars: continue
             
-            if total_class_load > weekly_slots:
-                # Kapasite aşımı varsa zorlama, yapabildiğin kadar yap
-                model.Add(sum(lesson_vars) <= count)
-            else:
-                # Kapasite yetiyorsa tam sayıya zorla -> YUMUŞATILDI
-                # model.Add(sum(lesson_vars) == count)
-                missing_lesson = model.NewIntVar(0, count, f"missing_{c_name}_{crs_name}")
-                model.Add(sum(lesson_vars) + missing_lesson == count)
-                penalties.append(missing_lesson * 500000) # En yüksek öncelik: Dersin atanması
-                penalty_tracking.append((missing_lesson, f"Ders Atanamadı: {c_name} - {crs_name} (Eksik: {{}} saat)"))
+        if total_class_load > weekly_slots:
+            # Kapasite aşımı varsa zorlama, yapabildiğin kadar yap
+            model.Add(linear_sum(weekly_vars) <= count)
+        else:
+            # Kapasite yetiyorsa tam sayıya zorla -> YUMUŞATILDI
+            # model.Add(sum(lesson_vars) == count)
+            missing_lesson = model.NewIntVar(0, count, f"missing_{c_name}_{crs_name}" if nm else "")
+            model.Add(linear_sum(weekly_vars) + missing_lesson == count)
+            missing_vars[a] = missing_lesson
+            penalties.append((missing_lesson, 500000)) # En yüksek öncelik: Dersin atanması
+            penalty_tracking.append((missing_lesson, f"Ders Atanamadı: {c_name} - {crs_name} (Eksik: {{}} saat)"))
 
     # 2. Bir sınıf aynı anda sadece 1 derste olabilir
-    for c_name in classes:
-        # Eş zamanlı derslerde (Sınıf bölme), ikinci dersi çakışma kontrolünden hariç tut
-        # Çünkü birinci dersle aynı anda yapılmasına izin veriyoruz.
-        skip_courses = set()
-        if simultaneous_lessons and c_name in simultaneous_lessons:
-            for pair in simultaneous_lessons[c_name]:
-                if len(pair) >= 2:
-                    skip_courses.add(pair[1]) # Çiftin ikinci elemanını atla
-        
-        for d in days:
-            for h in hours:
-                current_vars = []
-                if c_name in class_lessons:
-                    for crs_name in class_lessons[c_name]:
-                        if crs_name in skip_courses: continue
-                        
-                        t_name = assignments.get(c_name, {}).get(crs_name)
-                        if t_name:
-                            available_rooms = get_allowed_rooms(crs_name, t_name)
-                                    
-                            for r_name in available_rooms:
-                                key = (c_name, crs_name, t_name, r_name, d, h)
-                                if key in lessons:
-                                    current_vars.append(lessons[key])
-                if current_vars:
-                    model.Add(sum(current_vars) <= 1)
+    # (Eş zamanlı ikinci dersler class_rows oluşturulurken hariç tutuldu)
+    # Saat başına değişken sayısı tensör üzerinden tek seferde sayılır, tek adaylı saatler atlanır.
+    for rows in class_rows.values():
+        slot_counts = has_var[rows].sum(axis=(0, 1))
+        for d_idx, h_idx in np.argwhere(slot_counts > 1).tolist():
+            add_at_most_one(pick(var_index[rows, :, d_idx, h_idx]))
 
     # 3. Bir öğretmen aynı anda sadece 1 derste olabilir
-    all_teachers = set(k[2] for k in lessons.keys())
-    
-    for t_name in all_teachers:
-        for d in days:
-            for h in hours:
-                teacher_vars = []
-                for key, var in lessons.items():
-                    # key = (c_name, crs_name, t_assigned, r_name, d_key, h_key)
-                    if key[2] == t_name and key[4] == d and key[5] == h:
-                        teacher_vars.append(var)
-                
-                if teacher_vars:
-                    model.Add(sum(teacher_vars) <= 1)
+    for rows in teacher_rows.values():
+        slot_counts = has_var[rows].sum(axis=(0, 1))
+        for d_idx, h_idx in np.argwhere(slot_counts > 1).tolist():
+            add_at_most_one(pick(var_index[rows, :, d_idx, h_idx]))
 
     # 4. DERSLİK KISITLAMASI: Bir derslikte aynı anda sadece 1 ders olabilir
     if mode == "room" and rooms:
         if room_capacities is None: room_capacities = {}
-        for r_name in rooms:
-            capacity = safe_int(room_capacities.get(r_name), 1)
-            for d in days:
-                for h in hours:
-                    room_vars = []
-                    for key, var in lessons.items():
-                        if key[3] == r_name and key[4] == d and key[5] == h:
-                            room_vars.append(var)
-                    if room_vars:
-                        model.Add(sum(room_vars) <= capacity)
+        for r_name, members in room_pools.items():
+            capacity = sum(_room_capacity(room_capacities, m) for m in members)
+            r_col = room_col[r_name]
+            slot_counts = has_var[:, r_col].sum(axis=0)
+            for d_idx, h_idx in np.argwhere(slot_counts > capacity).tolist():
+                room_vars = pick(var_index[:, r_col, d_idx, h_idx])
+                if capacity == 1:
+                    add_at_most_one(room_vars)
+                else:
+                    model.Add(linear_sum(room_vars) <= capacity)
 
-    # 5. ÖĞRETMEN MÜSAİTLİK (İZİN GÜNÜ) KISITLAMASI
-    # teachers listesinden izin günlerini alıyoruz
-    if progress_callback: progress_callback(40, "Öğretmen ve derslik kısıtlamaları işleniyor...")
-    
-    teacher_unavailable = {str(t['name']).strip(): t.get('unavailable_days') or [] for t in teachers if t.get('name')}
-    
-    for t_name, bad_days in teacher_unavailable.items():
-        for d in bad_days:
-            # Bu öğretmenin yasaklı günündeki tüm ders olasılıklarını bul
-            variables = []
-            for key, var in lessons.items():
-                # key: (c_name, crs_name, t_assigned, r_name, d_key, h_key)
-                if key[2] == t_name and key[4] == d:
-                    variables.append(var)
-            
-            if variables:
-                model.Add(sum(variables) == 0)
+        # İki aşamalı modda derslik değişkeni yoktur: Aynı derslik grubuna (uygunluk kümesine) sığmak
+        # zorunda olan derslerin sayısı, o grubun toplam kapasitesini aşamaz (Hall koşulu).
+        if two_phase:
+            for group_mask, group_cap, group_rows in eligibility_groups(eligibility, room_capacities, lesson_masks):
+                slot_counts = has_var[group_rows].sum(axis=(0, 1))
+                for d_idx, h_idx in np.argwhere(slot_counts > group_cap).tolist():
+                    model.Add(linear_sum(pick(var_index[group_rows, :, d_idx, h_idx])) <= group_cap)
 
+    # 5. ÖĞRETMEN MÜSAİTLİK (İZİN GÜNÜ) KISITLAMASI
     # 11. ÖĞRETMEN SAAT KISITLAMASI (Belirli saatlerde müsait değil)
-    # Format: "Gün:Saat" (Örn: "Pazartesi:1")
-    teacher_unavailable_slots = {str(t['name']).strip(): t.get('unavailable_slots') or [] for t in teachers if t.get('name')}
-    for t_name, bad_slots in teacher_unavailable_slots.items():
-        for slot in bad_slots:
-            try:
-                if ":" not in slot: continue
-                d_str, h_str = slot.split(":", 1)
-                d_str = d_str.strip()
-                h_val = int(h_str.strip())
-                
-                for key, var in lessons.items():
-                    # key: (c_name, crs_name, t_name, r_name, d, h)
-                    if key[2] == t_name and key[4] == d_str and key[5] == h_val:
-                        model.Add(var == 0)
-            except ValueError:
-                continue
+    # -> Değişkenler oluşturulurken bu saatler hiç açılmaz (bkz. teacher_blocked_slots)
+    if progress_callback: progress_callback(40, "Öğretmen ve derslik kısıtlamaları işleniyor...")
 
     # 6. ÖĞRETMEN GÜNLÜK MAKSİMUM DERS SAATİ KISITLAMASI
-    teacher_max_hours = {str(t['name']).strip(): safe_int(t.get('max_hours_per_day'), 8) for t in teachers if t.get('name')}
-    
-    for t_name, limit in teacher_max_hours.items():
-        for d in days:
+    for t_id, t_name in enumerate(problem.teacher_names):
+        if draft: break # Taslak modda yumuşak kurallar eklenmez
+        if not problem.teacher_known[t_id]: continue # Tanımsız öğretmen: Limit yok
+        if t_id not in teacher_rows: continue
+        rows = teacher_rows[t_id]
+        limit = problem.teacher_max_daily[t_id]
+        for d_idx, d in enumerate(days):
             # Bu öğretmenin o günkü tüm dersleri
-            daily_vars = []
-            for key, var in lessons.items():
-                # key: (c_name, crs_name, t_assigned, r_name, d_key, h_key)
-                if key[2] == t_name and key[4] == d:
-                    daily_vars.append(var)
-            
+            daily_vars = pick(var_index[rows, :, d_idx])
             if daily_vars:
                 # model.Add(sum(daily_vars) <= limit) -> YUMUŞATILDI
-                excess_daily = model.NewIntVar(0, num_hours, f"excess_daily_{t_name}_{d}")
-                model.Add(sum(daily_vars) <= limit + excess_daily)
-                penalties.append(excess_daily * 50000) # Günlük limit aşımı cezası
+                if lean_build and len(daily_vars) <= limit: continue # Limit aşılamaz, ceza değişkenine gerek yok
+                excess_daily = model.NewIntVar(0, num_hours, f"excess_daily_{t_name}_{d}" if nm else "")
+                model.Add(linear_sum(daily_vars) <= limit + excess_daily)
+                penalties.append((excess_daily, 50000)) # Günlük limit aşımı cezası
                 penalty_tracking.append((excess_daily, f"Öğretmen Günlük Limit Aşımı: {t_name} - {d} (Fazla: {{}} saat)"))
 
     # 7. BLOK DERS KISITLAMASI (Aynı gün içindeki dersler birbirini takip etmeli)
     if progress_callback: progress_callback(60, "Blok ders ve süreklilik kuralları uygulanıyor...")
     
-    for c_name in classes:
-        if c_name not in class_lessons: continue
-        for crs_name in class_lessons[c_name]:
-            t_name = assignments.get(c_name, {}).get(crs_name)
-            if not t_name: continue
-            
-            available_rooms = get_allowed_rooms(crs_name, t_name)
-            
-            for d in days:
-                # active_vars[h]: O saatte bu ders var mı? (Bool)
-                active_vars = {}
-                for h in hours:
-                    # İlgili dersin tüm derslik alternatiflerini topla
-                    current_vars = []
-                    for r_name in available_rooms:
-                        key = (c_name, crs_name, t_name, r_name, d, h)
-                        if key in lessons:
-                            current_vars.append(lessons[key])
-                    
-                    if current_vars:
-                        active_vars[h] = model.NewBoolVar(f"active_{c_name}_{crs_name}_{d}_{h}")
-                        model.Add(sum(current_vars) == active_vars[h])
+    for a, (c_id, crs_id, t_id, count) in enumerate(problem.lessons):
+        if block_model == "interval" and problem.course_block_size[crs_id] > 1:
+            continue # Blok dersler başlangıç modeliyle kurulur (bkz. 12)
+        if a in group_leader: continue # Eş zamanlı grup üyesi: Liderle aynı saatlerde (süreklilik lider üzerinden)
+        c_name = problem.class_names[c_id]
+        crs_name = problem.course_names[crs_id]
+
+        for d_idx, d in enumerate(days):
+            # active_vars[h]: O saatte bu ders var mı? (Bool)
+            active_vars = {}
+            for h in hours:
+                # İlgili dersin tüm derslik alternatifleri
+                current_vars = pick(var_index[a, :, d_idx, h - 1])
+                if a in group_timing:
+                    # Eş zamanlı grup: Ortak saat değişkeni (derslik bağlantısı grup kurulurken eklendi)
+                    active_vars[h] = group_timing[a].get((d_idx, h - 1), 0)
+                elif lean_build and current_vars and len(current_vars) == 1:
+                    # Tek derslik alternatifi (veya dersliksiz model): Değişkenin kendisi yeterli
+                    active_vars[h] = current_vars[0]
+                elif current_vars:
+                    active_vars[h] = model.NewBoolVar(f"active_{c_name}_{crs_name}_{d}_{h}" if nm else "")
+                    if lean_build:
+                        # sum(current_vars) == active  <=>  ExactlyOne(current_vars + [¬active])
+                        model.AddExactlyOne(current_vars + [active_vars[h].Not()])
                     else:
-                        active_vars[h] = 0
+                        model.Add(sum(current_vars) == active_vars[h])
+                else:
+                    active_vars[h] = 0
                 
-                # Blok başlangıçlarını say (0'dan 1'e geçiş sayısı <= 1 olmalı)
-                start_vars = []
-                for h in hours:
-                    is_start = model.NewBoolVar(f"start_{c_name}_{crs_name}_{d}_{h}")
-                    start_vars.append(is_start)
-                    prev = active_vars[h-1] if h > 1 else 0
-                    model.Add(is_start >= active_vars[h] - prev)
+            if lean_build and sum(1 for v in active_vars.values() if not isinstance(v, int)) <= 1:
+                continue # En fazla bir saat açık: Blok bölünemez
+
+            # Blok başlangıçlarını say (0'dan 1'e geçiş sayısı <= 1 olmalı)
+            start_vars = []
+            for h in hours:
+                if lean_build and isinstance(active_vars[h], int):
+                    continue # Bu saatte ders olamaz, başlangıç da olamaz
+                prev = active_vars[h-1] if h > 1 else 0
+                if lean_build and isinstance(prev, int):
+                    # Önceki saat kapalı: Bu saat açıksa başlangıçtır
+                    start_vars.append(active_vars[h])
+                    continue
+                is_start = model.NewBoolVar(f"start_{c_name}_{crs_name}_{d}_{h}" if nm else "")
+                start_vars.append(is_start)
+                model.Add(is_start >= active_vars[h] - prev)
                 
+            if lean_build:
+                add_at_most_one(start_vars)
+            else:
                 model.Add(sum(start_vars) <= 1)
 
     # 8. DERS GÜNLÜK MAKSİMUM SAAT KISITLAMASI
-    for c_name in classes:
-        if c_name not in class_lessons: continue
-        for crs_name in class_lessons[c_name]:
-            limit = safe_int(get_course_prop(crs_name, 'max_daily_hours', 2), 2)
-            # Çakışma Önleyici: Eğer blok süresi günlük limitten büyükse, limiti blok süresine eşitle
-            blk_size = safe_int(get_course_prop(crs_name, 'block_size', 1), 1)
-            limit = max(limit, blk_size)
-            
-            t_name = assignments.get(c_name, {}).get(crs_name)
-            if not t_name: continue
-
-            available_rooms = get_allowed_rooms(crs_name, t_name)
-
-            for d in days:
-                daily_vars = []
-                for h in hours:
-                    for r_name in available_rooms:
-                        key = (c_name, crs_name, t_name, r_name, d, h)
-                        if key in lessons:
-                            daily_vars.append(lessons[key])
+    for a, (c_id, crs_id, t_id, count) in enumerate(problem.lessons):
+        if draft: break # Taslak modda yumuşak kurallar eklenmez
+        c_name = problem.class_names[c_id]
+        crs_name = problem.course_names[crs_id]
+        limit = problem.course_max_daily[crs_id]
+        # Çakışma Önleyici: Eğer blok süresi günlük limitten büyükse, limiti blok süresine eşitle
+        blk_size = problem.course_block_size[crs_id]
+        limit = max(limit, blk_size)
+
+        for d_idx, d in enumerate(days):
+            daily_vars = pick(var_index[a, :, d_idx])
                 
-                if daily_vars:
-                    # model.Add(sum(daily_vars) <= limit) -> YUMUŞATILDI
-                    excess_course = model.NewIntVar(0, num_hours, f"excess_course_{c_name}_{crs_name}_{d}")
-                    model.Add(sum(daily_vars) <= limit + excess_course)
-                    penalties.append(excess_course * 10000)
-                    penalty_tracking.append((excess_course, f"Ders Günlük Limit Aşımı: {c_name} - {crs_name} - {d} (Fazla: {{}} saat)"))
+            if daily_vars:
+                if lean_build and len(daily_vars) <= limit: continue # Limit aşılamaz
+                # model.Add(sum(daily_vars) <= limit) -> YUMUŞATILDI
+                excess_course = model.NewIntVar(0, num_hours, f"excess_course_{c_name}_{crs_name}_{d}" if nm else "")
+                model.Add(linear_sum(daily_vars) <= limit + excess_course)
+                penalties.append((excess_course, 10000))
+                penalty_tracking.append((excess_course, f"Ders Günlük Limit Aşımı: {c_name} - {crs_name} - {d} (Fazla: {{}} saat)"))
 
     # 9. ÖĞLE ARASI KISITLAMASI
-    if lunch_break_hour:
-        # Tüm dersler için belirtilen saatte ders yapılmasını engelle
-        for key, var in lessons.items():
-            # key: (c_name, crs_name, t_name, r_name, d, h)
-            if key[5] == lunch_break_hour:
-                model.Add(var == 0)
+    # -> Öğle arası saatinde hiç değişken oluşturulmaz (bkz. open_slots)
 
     # 12. DERS BLOK (SABİT SÜRE) KISITLAMASI
-    for c_name in classes:
-        if c_name not in class_lessons: continue
-        for crs_name, count in class_lessons[c_name].items():
-            blk = safe_int(get_course_prop(crs_name, 'block_size', 1), 1)
-            if blk <= 1: continue
-            
-            t_name = assignments.get(c_name, {}).get(crs_name)
-            if not t_name: continue
+    for a, (c_id, crs_id, t_id, count) in enumerate(problem.lessons):
+        blk = problem.course_block_size[crs_id]
+        if blk <= 1: continue
+        c_name = problem.class_names[c_id]
+        crs_name = problem.course_names[crs_id]
             
-            available_rooms = get_allowed_rooms(crs_name, t_name)
-            # İzin verilen günlük ders sürelerini hesapla
-            # Örn: Haftalık 5 saat, Blok 2 ise -> Günlük 0, 2 veya 1 (kalan) olabilir.
-            # DÜZELTME: Günlük limit izin veriyorsa blok katlarına (2, 4, 6...) izin ver.
-            count = int(count)
-            limit = safe_int(get_course_prop(crs_name, 'max_daily_hours', 2), 2)
-            limit = max(limit, blk) # Limit en az blok kadar olmalı
-            
-            allowed = {0}
-            current_blk = blk
-            while current_blk <= limit and current_blk <= count:
-                allowed.add(current_blk)
-                current_blk += blk
-            
-            remainder = count % blk
-            if remainder > 0:
-                allowed.add(remainder)
-            
-            allowed_durations = sorted(list(allowed))
-
-            for d in days:
-                daily_vars = []
-                for h in hours:
-                    for r_name in available_rooms:
-                        key = (c_name, crs_name, t_name, r_name, d, h)
-                        if key in lessons:
-                            daily_vars.append(lessons[key])
+        # İzin verilen günlük ders süreleri (bkz. block_durations)
+        # Örn: Haftalık 5 saat, Blok 2 ise -> Günlük 0, 2 veya 1 (kalan) olabilir.
+        # DÜZELTME: Günlük limit izin veriyorsa blok katlarına (2, 4, 6...) izin ver.
+        allowed_durations = block_durations(problem, crs_id, count)
+
+        if block_model == "interval":
+            # Başlangıç modeli: Her (derslik, gün, başlangıç saati, süre) için isteğe bağlı bir aralık.
+            # Günde en fazla bir başlangıç seçilir; saatlik değişken, o saati kapsayan başlangıçların toplamıdır.
+            # Süreklilik (7) ve izin verilen süreler (12) böylece yardımcı değişken olmadan sağlanır.
+            sizes = [size for size in allowed_durations if size > 0]
+            for d_idx, d in enumerate(days):
+                day_starts = []
+                for r_col in lesson_domains[a][0]:
+                    cover = defaultdict(list) # saat sırası -> o saati kapsayan başlangıçlar
+                    for size in sizes:
+                        for h_idx in range(num_hours - size + 1):
+                            if (var_index[a, r_col, d_idx, h_idx:h_idx + size] < 0).any(): continue
+                            present = model.NewBoolVar(f"block_{c_name}_{crs_name}_{room_axis[r_col]}_{d}_{h_idx + 1}_{size}" if nm else "")
+                            if block_no_overlap: # Aralıklar sadece 13. bölümün kısıtlarında kullanılır
+                                interval = model.NewOptionalFixedSizeIntervalVar(d_idx * num_hours + h_idx, size, present, "")
+                                block_intervals.setdefault(a, []).append((r_col, interval))
+                            day_starts.append(present)
+                            for k in range(h_idx, h_idx + size):
+                                cover[k].append(present)
+                    for h_idx in range(num_hours):
+                        pos = int(var_index[a, r_col, d_idx, h_idx])
+                        if pos >= 0:
+                            model.Add(lesson_vars[pos] == linear_sum(cover[h_idx]))
+                if len(day_starts) > 1:
+                    add_at_most_one(day_starts)
+            continue
+
+        for d_idx, d in enumerate(days):
+            daily_vars = pick(var_index[a, :, d_idx])
                 
-                if daily_vars:
-                    # Günlük toplam ders saati değişkeni
-                    daily_sum = model.NewIntVar(0, num_hours, f"daily_sum_{c_name}_{crs_name}_{d}")
-                    model.Add(daily_sum == sum(daily_vars))
+            if daily_vars:
+                # Günlük toplam ders saati değişkeni
+                daily_sum = model.NewIntVar(0, num_hours, f"daily_sum_{c_name}_{crs_name}_{d}" if nm else "")
+                model.Add(daily_sum == linear_sum(daily_vars))
                     
-                    # Günlük toplam sadece izin verilen değerlerden biri olabilir (0, Blok, Kalan)
-                    domain = cp_model.Domain.FromValues(allowed_durations)
-                    model.AddLinearExpressionInDomain(daily_sum, domain)
+                # Günlük toplam sadece izin verilen değerlerden biri olabilir (0, Blok, Kalan)
+                domain = cp_model.Domain.FromValues(allowed_durations)
+                model.AddLinearExpressionInDomain(daily_sum, domain)
+
+    # 13. BLOK DERS ARALIKLARI (Başlangıç modeli, block_no_overlap)
+    # Blok dersi olan öğretmen ve sınıfların tüm dersleri tek bir NoOverlap kısıtında toplanır (tek saatlik dersler
+    # 1 saatlik aralık olur). Saatlik "en fazla bir" kısıtlarına ek olarak blokların tamamı birlikte yayılır.
+    # Birleşik derslik modelinde blok dersi alan derslikler için de NoOverlap (kapasite 1) veya Cumulative eklenir.
+    if block_intervals and block_no_overlap:
+        unit_intervals = {} # lesson_vars sırası -> 1 saatlik isteğe bağlı aralık
+
+        def row_intervals(rows, r_col=None):
+            result = []
+            for a in rows:
+                if a in block_intervals:
+                    result.extend(interval for col, interval in block_intervals[a] if r_col is None or col == r_col)
+                    continue
+                for col, d_idx, h_idx in np.argwhere(var_index[a] >= 0).tolist():
+                    if r_col is not None and col != r_col: continue
+                    pos = int(var_index[a, col, d_idx, h_idx])
+                    if pos not in unit_intervals:
+                        unit_intervals[pos] = model.NewOptionalFixedSizeIntervalVar(d_idx * num_hours + h_idx, 1, lesson_vars[pos], "")
+                    result.append(unit_intervals[pos])
+            return result
+
+        for rows in list(teacher_rows.values()) + list(class_rows.values()):
+            if any(int(a) in block_intervals for a in rows):
+                model.AddNoOverlap(row_intervals(rows.tolist()))
+
+        if not room_free:
+            for r_name, members in room_pools.items():
+                r_col = room_col[r_name]
+                if not any(col == r_col for items in block_intervals.values() for col, _ in items): continue
+                rows = np.flatnonzero(has_var[:, r_col].any(axis=(1, 2))).tolist()
+                intervals = row_intervals(rows, r_col)
+                capacity = sum(_room_capacity(room_capacities, m) for m in members)
+                if capacity == 1:
+                    model.AddNoOverlap(intervals)
+                else:
+                    model.AddCumulative(intervals, [1] * len(intervals), capacity)
 
     # 14. ÖĞRETMEN SABAH/ÖĞLE TERCİHİ (SABAHÇI / ÖĞLENCİ)
-    for t in teachers:
-        pref = t.get('preference')
-        if not pref or pref == "Farketmez": continue
-        
-        if not t.get('name'): continue
-        t_name = str(t['name']).strip()
+    for t_id, t_name in enumerate(problem.teacher_names):
+        pref = problem.teacher_preference[t_id]
+        if draft: break # Taslak modda yumuşak kurallar eklenmez
+        if not pref or t_id not in teacher_rows: continue
+        rows = teacher_rows[t_id]
         
         # Sabah/Öğle ayrımı (Öğle arası saatine göre veya ortadan bölerek)
         if lunch_break_hour:
@@ -469,84 +1330,48 @@ def create_timetable(teachers, courses, classes, class_lessons, assignments, roo
         elif pref == "Öğlenci":
             forbidden_slots = morning_slots
             
-        for d in days:
+        forbidden_cols = [h - 1 for h in forbidden_slots]
+        for d_idx, d in enumerate(days):
+            if lean_build:
+                # Öğretmen-gün başına tek ihlal sayacı (değişken başına ayrı terim yerine)
+                pref_vars = pick(var_index[rows, :, d_idx][:, :, forbidden_cols])
+                if not pref_vars: continue
+                pref_violation = model.NewIntVar(0, len(forbidden_slots), f"pref_{t_name}_{d}" if nm else "")
+                model.Add(pref_violation == linear_sum(pref_vars))
+                penalties.append((pref_violation, 20000))
+                penalty_tracking.append((pref_violation, f"Tercih İhlali ({pref}): {t_name} - {d} ({{}} saat)"))
+                continue
             for h in forbidden_slots:
-                for key, var in lessons.items():
-                    # key: (c_name, crs_name, t_name, r_name, d, h)
-                    if key[2] == t_name and key[4] == d and key[5] == h:
-                        # model.Add(var == 0) -> YUMUŞATILDI
-                        penalties.append(var * 20000)
-                        penalty_tracking.append((var, f"Tercih İhlali ({pref}): {t_name} - {d}:{h}"))
+                for var in pick(var_index[rows, :, d_idx, h - 1]):
+                    # model.Add(var == 0) -> YUMUŞATILDI
+                    penalties.append((var, 20000))
+                    penalty_tracking.append((var, f"Tercih İhlali ({pref}): {t_name} - {d}:{h}"))
 
     # 15. EŞ ZAMANLI DERSLER (Sınıf Bölme)
-    # Tanımlanan ders çiftlerinin aynı saatte yapılmasını zorunlu kıl
+    # -> Grup üyeleri ortak saat değişkenlerini paylaşır (bkz. Eş Zamanlı Ders Grupları), saat başına eşitlik gerekmez
     if progress_callback: progress_callback(80, "Özel durumlar ve optimizasyon hedefleri hazırlanıyor...")
-    
-    if simultaneous_lessons:
-        for c_name, pairs in simultaneous_lessons.items():
-            if c_name not in class_lessons: continue
-            
-            for pair in pairs:
-                if len(pair) < 2: continue
-                c1, c2 = pair[0], pair[1]
-                
-                # Bu derslerin atanmış olması lazım
-                if c1 not in class_lessons[c_name] or c2 not in class_lessons[c_name]: continue
-                
-                # Sync Constraint: Her saat dilimi için c1 varsa c2 de olmalı
-                for d in days:
-                    for h in hours:
-                        # c1 değişkenleri
-                        vars_c1 = []
-                        t1 = assignments.get(c_name, {}).get(c1)
-                        if t1:
-                            rooms1 = get_allowed_rooms(c1, t1)
-                            for r in rooms1:
-                                key = (c_name, c1, t1, r, d, h)
-                                if key in lessons: vars_c1.append(lessons[key])
-                        
-                        # c2 değişkenleri
-                        vars_c2 = []
-                        t2 = assignments.get(c_name, {}).get(c2)
-                        if t2:
-                            rooms2 = get_allowed_rooms(c2, t2)
-                            for r in rooms2:
-                                key = (c_name, c2, t2, r, d, h)
-                                if key in lessons: vars_c2.append(lessons[key])
-                        
-                        if vars_c1 and vars_c2:
-                            model.Add(sum(vars_c1) == sum(vars_c2))
 
     # 17. ÖĞRETMEN GÜNLÜK DERS YÜKÜ DENGESİ (Min-Max)
     # Eğer öğretmen o gün okula geliyorsa, en az X saat dersi olsun.
-    for t in teachers:
-        if not t.get('name'): continue
-        t_name = str(t['name']).strip()
-        
-        # Toplam ders yükünü hesapla
-        t_load = 0
-        for c_name, course_dict in class_lessons.items():
-            for crs_name, count in course_dict.items():
-                if assignments.get(c_name, {}).get(crs_name) == t_name:
-                    t_load += int(count)
+    for t_id, t_name in enumerate(problem.teacher_names):
+        if draft: break # Taslak modda yumuşak kurallar eklenmez
+        if not problem.teacher_known[t_id]: continue
         
+        t_load = problem.teacher_load[t_id]
         if t_load == 0: continue
+        rows = teacher_rows[t_id]
         
         # Eğer toplam yük minimumdan azsa, bu kısıtlamayı uygulama (veya sadece toplam kadar olsun de)
         effective_min = min_daily_hours
         if t_load < effective_min:
             effective_min = t_load
 
-        for d in days:
-            daily_vars = []
-            for key, var in lessons.items():
-                if key[2] == t_name and key[4] == d:
-                    daily_vars.append(var)
-            
+        for d_idx, d in enumerate(days):
+            daily_vars = pick(var_index[rows, :, d_idx])
             if daily_vars:
-                is_present = model.NewBoolVar(f"present_{t_name}_{d}")
-                daily_sum = model.NewIntVar(0, num_hours, f"daily_sum_{t_name}_{d}")
-                model.Add(daily_sum == sum(daily_vars))
+                is_present = model.NewBoolVar(f"present_{t_name}_{d}" if nm else "")
+                daily_sum = model.NewIntVar(0, num_hours, f"daily_sum_{t_name}_{d}" if nm else "")
+                model.Add(daily_sum == linear_sum(daily_vars))
                 
                 # is_present <-> daily_sum > 0
                 model.Add(daily_sum > 0).OnlyEnforceIf(is_present)
@@ -554,140 +1379,831 @@ def create_timetable(teachers, courses, classes, class_lessons, assignments, roo
                 
                 # is_present -> daily_sum >= effective_min -> YUMUŞATILDI
                 # model.Add(daily_sum >= effective_min).OnlyEnforceIf(is_present)
-                slack = model.NewIntVar(0, effective_min, f"min_daily_slack_{t_name}_{d}")
+                slack = model.NewIntVar(0, effective_min, f"min_daily_slack_{t_name}_{d}" if nm else "")
                 model.Add(daily_sum + slack >= effective_min).OnlyEnforceIf(is_present)
-                penalties.append(slack * 5000)
+                penalties.append((slack, 5000))
                 penalty_tracking.append((slack, f"Öğretmen Günlük Min. Ders İhlali: {t_name} - {d} (Eksik: {{}} saat)"))
 
+    # 18. SİMETRİ KIRMA
+    # Yer değiştirebilen ders satırları: Aynı sınıfta aynı özellikli ders kopyaları (örn. "Matematik (Grup A)" /
+    # "(Grup B)"), aynı öğretmenle veya sadece bu dersi veren eşdeğer (aynı kısıtlı öğretmen) öğretmenlerle.
+    # İki satırın yerleşimleri takas edilince aynı maliyetli başka bir çözüm çıkar; günlük saat sayıları vektörü
+    # sözlük sırasıyla azalan olmalıdır (tek doğrusal kısıt, basamak tabanı num_hours + 1).
+    # Havuzlanmamış (pool_rooms=False) özdeş derslikler: Haftalık kullanım derslik sırasıyla azalan olmalıdır.
+    # Onarım modunda (önceki yerleşime ödül), ipucu (önceki program) verildiğinde ve sabitlenmiş ders / derslikler
+    # için uygulanmaz: Sıralama ipucundaki yerleşimle çelişebilir, sıcak başlangıç boşa gider.
+    if symmetry_breaking and repair_schedule is None and not hint_schedule:
+        interchangeable = defaultdict(list)
+        for a, (c_id, crs_id, t_id, count) in enumerate(problem.lessons):
+            if a in group_leader or a in group_members or a in pin_slots: continue
+            if len(teacher_rows[t_id]) == 1:
+                teacher_key = (
+                    None, problem.teacher_unavailable[t_id], problem.teacher_max_daily[t_id],
+                    problem.teacher_preference[t_id], problem.teacher_known[t_id]
+                )
+            else:
+                teacher_key = (t_id,)
+            course_key = (
+                problem.course_base[crs_id], problem.course_branch[crs_id], problem.course_max_daily[crs_id],
+                problem.course_block_size[crs_id], problem.course_specific_room[crs_id]
+            )
+            r_cols, lesson_slots = lesson_domains[a]
+            key = (c_id, count, teacher_key, course_key, lesson_masks.get(a), tuple(r_cols), tuple(lesson_slots))
+            interchangeable[key].append(a)
+
+        day_weights = [(num_hours + 1) ** (len(days) - 1 - d_idx) for d_idx in range(len(days))]
+        for rows in interchangeable.values():
+            for a, b in zip(rows, rows[1:]):
+                terms, weights = [], []
+                for d_idx, weight in enumerate(day_weights):
+                    for var in pick(var_index[a, :, d_idx]):
+                        terms.append(var)
+                        weights.append(weight)
+                    for var in pick(var_index[b, :, d_idx]):
+                        terms.append(var)
+                        weights.append(-weight)
+                if terms:
+                    model.Add(cp_model.LinearExpr.WeightedSum(terms, weights) >= 0)
+
+        if mode == "room" and not two_phase and not pool_rooms:
+            pinned_rooms = {item.get("Derslik") for item in pinned_lessons or [] if isinstance(item, dict)}
+            for members in detect_room_pools(
+                eligibility.rooms, courses, room_capacities=room_capacities, room_branches=room_branches,
+                room_teachers=room_teachers, room_courses=room_courses, room_excluded_courses=room_excluded_courses
+            ):
+                members = [r_name for r_name in members if r_name in room_col and r_name not in pinned_rooms]
+                for first, second in zip(members, members[1:]):
+                    model.Add(
+                        linear_sum(pick(var_index[:, room_col[first]])) >= linear_sum(pick(var_index[:, room_col[second]]))
+                    )
+
     # --- Amaç Fonksiyonu ---
     # Gevşetilmiş kısıtlamalar (<=) kullanıldığında boş program dönmemesi için atamayı maksimize et
     # 1. Ana Hedef: Toplam atanan ders sayısını maksimize et
-    total_assigned = sum(lessons.values())
-    objective_terms = [total_assigned * 10000] # Ana hedefe yüksek ağırlık
-    
-    if penalties:
-        objective_terms.append(-sum(penalties))
+    # Amaç terimleri (ifade, ağırlık) olarak toplanır
+    objective_terms = [(var, 10000) for var in lesson_vars] # Ana hedefe yüksek ağırlık
+    objective_terms.extend((var, -weight) for var, weight in penalties)
+    if draft:
+        # Taslak: Sadece yerleşen ders saati (Tümü yerleşince üst sınıra ulaşılır ve arama hemen biter)
+        objective_terms = [(var, 1) for var in lesson_vars]
+    lexicographic = objective_mode == "lexicographic"
 
     # 2. İkincil Hedef: Derslik kullanımını dengele (Sadece 'room' modunda)
     # En yoğun kullanılan dersliğin yükünü minimize ederek dağılımı dengele
-    if mode == "room" and rooms:
+    if mode == "room" and rooms and not two_phase and not draft:
         if room_capacities is None: room_capacities = {}
-        room_usage_vars = []
-        for r_name in rooms:
-            # Bu derslikteki toplam ders sayısı
-            r_vars = [lessons[k] for k in lessons if k[3] == r_name]
+        max_room_load = None
+        for r_name, members in room_pools.items():
+            # Bu derslikteki (havuzdaki) toplam ders sayısı
+            r_vars = pick(var_index[:, room_col[r_name]])
             
             if r_vars:
-                cap = safe_int(room_capacities.get(r_name), 1)
+                cap = sum(_room_capacity(room_capacities, m) for m in members)
                 max_possible = num_hours * 5 * cap
-                r_usage = model.NewIntVar(0, max_possible, f"usage_{r_name}")
-                model.Add(r_usage == sum(r_vars))
-                room_usage_vars.append(r_usage)
+                r_usage = model.NewIntVar(0, max_possible, f"usage_{r_name}" if nm else "")
+                model.Add(r_usage == linear_sum(r_vars))
+                if max_room_load is None:
+                    max_room_load = model.NewIntVar(0, num_hours * 5 * 100, "max_room_load")
+                # Havuzda yük üyelere eşit dağıtılır: Derslik başına yük <= max_room_load
+                model.Add(r_usage <= max_room_load * len(members))
         
-        if room_usage_vars:
-            max_room_load = model.NewIntVar(0, num_hours * 5 * 100, "max_room_load")
-            model.AddMaxEquality(max_room_load, room_usage_vars)
-            objective_terms.append(-max_room_load)
+        if max_room_load is not None:
+            objective_terms.append((max_room_load, -1))
 
-    model.Maximize(sum(objective_terms))
+    # 3. Onarım Modu: Önceki yerleşimini koruyan her ders saati için küçük ödül (gereksiz kaydırmaları önler)
+    if repair_schedule is not None:
+        objective_terms.extend((lesson_vars[i], 10) for i in hint_positions(var_index, placements))
+
+    def weighted_sum(terms):
+        if lean_build:
+            return cp_model.LinearExpr.WeightedSum([v for v, _ in terms], [w for _, w in terms])
+        return sum(v * w for v, w in terms)
+
+    if lexicographic:
+        # Aşama terimleri: Yerleşen ders saati, ağırlığa göre ceza aileleri ve kalan terimler
+        tier_weights = {w for _, w in LEXICOGRAPHIC_TIERS if isinstance(w, int)}
+        objective_tiers = []
+        for (label, weight), share in zip(LEXICOGRAPHIC_TIERS, LEXICOGRAPHIC_TIME_SHARES):
+            if weight is None:
+                terms = [(var, 1) for var in lesson_vars]
+            elif weight == "rest":
+                terms = [(var, -w) for var, w in penalties if w not in tier_weights and w != 500000]
+                terms.extend(t for t in objective_terms[len(lesson_vars) + len(penalties):])
+            else:
+                terms = [(var, -1) for var, w in penalties if w == weight]
+            if terms:
+                objective_tiers.append((label, weight, terms, share))
+    else:
+        model.Maximize(weighted_sum(objective_terms))
+
+    # --- Sıcak Başlangıç (Warm Start) ---
+    # Önceki programdaki dersler 1, diğer ders değişkenleri 0 ipucu alır (yardımcı değişkenler çözücüye bırakılır).
+    if hint_schedule:
+        hinted = hint_positions(var_index, previous_placements(problem, hint_schedule, room_col, room_pool_of))
+        if hinted:
+            hint_values = {} # değişken sırası -> (değişken, ipucu); eş zamanlı grup üyeleri aynı değişkeni paylaşır
+            for i, var in enumerate(lesson_vars):
+                value = 1 if i in hinted else hint_values.get(var.Index(), (var, 0))[1]
+                hint_values[var.Index()] = (var, value)
+            for var, value in hint_values.values():
+                model.AddHint(var, value)
 
     # --- Çözüm ---
     if progress_callback: progress_callback(90, "Çözüm aranıyor (Bu işlem veri boyutuna göre sürebilir)...")
     solver = cp_model.CpSolver()
-    solver.parameters.max_time_in_seconds = 60.0 # Zaman aşımı limiti
-    solver.parameters.num_search_workers = 8 # Paralel işlem (Hızlandırma)
-    status = solver.Solve(model)
+    # Süre limiti, paralel iş parçacığı (çekirdek sayısı kadar) ve arama seviyesi profilden gelir
+    if draft and solver_profile is None: solver_profile = "draft"
+    apply_solver_profile(solver, solver_profile, time_limit=repair_time_limit if repair_schedule is not None else None)
+    if stop_event is not None and stop_event.is_set():
+        return [], "Arama durduruldu.", []
+    search_done = threading.Event()
+    if stop_event is not None:
+        threading.Thread(target=watch_stop_event, args=(solver, stop_event, search_done), daemon=True).start()
+    callback = None
+    if incumbent_callback or draft:
+        def preview_schedule(values):
+            # Ara çözüm önizlemesi: Sınıf modunda derslikler açgözlü atanır, havuzlar açılır
+            schedule = extract_schedule(problem, var_index, room_axis, values)
+            if mode != "room":
+                return assign_rooms(schedule, eligibility, room_capacities)
+            if any(len(members) > 1 for members in room_pools.values()):
+                return unpack_room_pools(schedule, room_pools, room_capacities)
+            return schedule
+        callback = IncumbentCallback(
+            incumbent_callback, lesson_vars, list(missing_vars.values()), [var for var, _ in penalty_tracking], preview_schedule,
+            stop_at_hours=sum(count for _, _, _, count in problem.lessons) if draft else None
+        )
+
+    solution = None # Kabul edilen son çözüm (tüm model değişkenleri)
+    tier_report = []
+    if lexicographic:
+        # Aşamalı çözüm: Her aşamada bir önceki çözüm ipucu olur, aşamanın değeri sonraki aşamalar için sabitlenir.
+        # Payında çözüm bulamayan aşama önceki çözümün değerini korur (kullanılmayan süre sonraki aşamalara kalır).
+        total_time = solver.parameters.max_time_in_seconds
+        solver_clock = 0.0
+        status = cp_model.UNKNOWN
+        for k, (label, weight, terms, share) in enumerate(objective_tiers):
+            if stop_event is not None and stop_event.is_set():
+                tier_report.extend((tier[0], None, "skipped") for tier in objective_tiers[k:])
+                break
+            remaining = total_time - solver_clock
+            solver.parameters.max_time_in_seconds = max(remaining * share / sum(t[3] for t in objective_tiers[k:]), 0.1)
+            if progress_callback: progress_callback(90, f"Aşama {k + 1}/{len(objective_tiers)}: {label} iyileştiriliyor...")
+            expr = weighted_sum(terms)
+            model.Maximize(expr)
+            if solution is not None:
+                hint_solution(model, solution)
+            tier_status = solver.Solve(model, callback) if callback else solver.Solve(model)
+            solver_clock += solver.WallTime()
+            if tier_status in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+                solution = np.asarray(solver.ResponseProto().solution, dtype=np.int64)
+                tier_value = int(round(solver.ObjectiveValue()))
+                state = "optimal" if tier_status == cp_model.OPTIMAL else "feasible"
+            elif solution is None:
+                status = tier_status # İlk aşamada çözüm yok: Sonraki aşamalar anlamsız
+                break
+            else:
+                tier_value = int(sum(w * solution[var.Index()] for var, w in terms)) # Önceki çözümün değeri
+                state = "unsolved"
+            # Rapor: Yerleşen saat / ihlal toplamı (karma "Diğer" aşamasında değer gösterilmez)
+            shown = tier_value if weight is None else (-tier_value if weight != "rest" else None)
+            tier_report.append((label, shown, state))
+            model.Add(expr >= tier_value) # Aşama değerini koru
+        if solution is not None:
+            all_proven = len(tier_report) == len(objective_tiers) and all(state == "optimal" for _, _, state in tier_report)
+            status = cp_model.OPTIMAL if all_proven else cp_model.FEASIBLE
+    elif callback:
+        status = solver.Solve(model, callback)
+    else:
+        status = solver.Solve(model)
+    search_done.set()
+    stopped = stop_event is not None and stop_event.is_set()
 
     if status == cp_model.OPTIMAL or status == cp_model.FEASIBLE:
-        schedule = []
-        for key, var in lessons.items():
-            if solver.Value(var):
-                schedule.append({
-                    "Sınıf": key[0],
-                    "Ders": key[1],
-                    "Öğretmen": key[2],
-                    "Derslik": key[3],
-                    "Gün": key[4],
-                    "Saat": key[5]
-                })
+        if solution is None:
+            solution = np.asarray(solver.ResponseProto().solution, dtype=np.int64)
+        values = solver_values(solver, lesson_vars, solution)
+        schedule = extract_schedule(problem, var_index, room_axis, values)
+
+        # Onarım: Yeniden çözülen bölgede eksik ders saati kaldıysa bölgeyi genişlet (sabit dersler hep tamdır)
+        if fixed_slots and repair_depth < REPAIR_MAX_DEPTH and not stopped:
+            missing_now = sum(int(solution[var.Index()]) for a, var in missing_vars.items() if a in free_rows)
+            if missing_now > 0:
+                if progress_callback: progress_callback(5, "Eksik ders kaldı, onarım bölgesi genişletiliyor...")
+                return create_timetable(**dict(call_args, repair_depth=repair_depth + 1))
+
+        # Sınıf modunda derslikleri çözüm sonrası ata (Sabit derslikler ve önceki programdaki derslikler mümkünse korunur)
+        kept_rooms = list(repair_schedule or hint_schedule or []) + list(pinned_lessons or [])
+        unroomed = [] # Durdurulan iki aşamalı çözümde dersliksiz kalan ders saatleri
+        if mode != "room":
+            schedule = assign_rooms(schedule, eligibility, room_capacities, previous=kept_rooms)
+        elif any(len(members) > 1 for members in room_pools.values()):
+            # Havuzları gerçek dersliklere aç
+            schedule = unpack_room_pools(schedule, room_pools, room_capacities, previous=kept_rooms)
+        elif two_phase:
+            # 2. Aşama: Her saat diliminde derslikleri akış modeliyle ata
+            if progress_callback: progress_callback(95, "Derslikler saat dilimlerine atanıyor (2. aşama)...")
+            flow_schedule = assign_rooms_by_flow(schedule, eligibility, room_capacities)
+            if flow_schedule is None and stopped:
+                # Arama durduruldu: Birleşik modele geçmek yerine derslikleri açgözlü yöntemle ata.
+                # Derslik çakıştırılmaz; boş derslik bulunamayan ders saatleri dersliksiz bırakılıp raporlanır.
+                flow_schedule = assign_rooms(schedule, eligibility, room_capacities, strict=True)
+                unroomed = [
+                    f"Derslik Atanamadı: {it['Sınıf']} - {it['Ders']} ({it['Gün']} {it['Saat']}. saat)"
+                    for it in flow_schedule if it["Derslik"] is None
+                ]
+            schedule = flow_schedule
+            if schedule is None:
+                if progress_callback: progress_callback(5, "Derslik ataması tamamlanamadı, birleşik modele geçiliyor...")
+                return create_timetable(**dict(call_args, room_engine="joint"))
         
-        violations = []
+        violations = list(unroomed)
         for var, desc in penalty_tracking:
-            if solver.Value(var) > 0:
-                violations.append(desc.format(solver.Value(var)))
-        return schedule, "Çözüm Bulundu!", violations
+            if solution[var.Index()] > 0:
+                violations.append(desc.format(int(solution[var.Index()])))
+        msg = "Taslak Program Hazır (Sadece zorunlu kurallar, tercihler gözetilmedi)." if draft else "Çözüm Bulundu!"
+        if stopped and status != cp_model.OPTIMAL:
+            msg = "Arama durduruldu, bulunan en iyi program kullanıldı."
+        if precheck_warnings:
+            msg += "\n\n⚠️ Ön Kontrol Uyarıları:\n" + "\n".join(precheck_warnings)
+        if ignored_pins:
+            msg += "\n\n📌 Yok Sayılan Sabitlemeler:\n" + "\n".join(ignored_pins)
+        if tier_report:
+            tier_states = {
+                "optimal": ("✅", "kanıtlanmış optimum"),
+                "feasible": ("⏳", "süre doldu, en iyi bulunan"),
+                "unsolved": ("⚠️", "payına düşen sürede çözüm bulunamadı, önceki aşamanın değeri korundu"),
+                "skipped": ("⏭️", "atlandı, arama durduruldu"),
+            }
+            msg += "\n\nAşamalar:\n" + "\n".join(
+                f"{tier_states[state][0]} {label}{'' if value is None else f': {value}'} ({tier_states[state][1]})"
+                for label, value, state in tier_report
+            )
+        return schedule, msg, violations
+    elif stopped:
+        return [], "Arama durduruldu (henüz bir çözüm bulunamamıştı).", []
+    elif status == cp_model.INFEASIBLE and any(pin_slots.values()):
+        # Sabitlemeler birlikte kurallarla çelişiyor (ön elemeden geçen bir bileşim): Sabitlemeler olmadan çöz
+        if progress_callback: progress_callback(5, "Sabitlemeler kurallarla çelişiyor, sabitlemeler olmadan çözülüyor...")
+        schedule, msg, violations = create_timetable(**dict(call_args, pinned_lessons=None))
+        pinned_count = sum(len(pins) for pins in pin_slots.values())
+        note = f"📌 {pinned_count} sabit hücre birlikte kurallarla çelişti; program sabitlemeler yok sayılarak oluşturuldu."
+        return schedule, f"{note}\n\n{msg}", violations
+    elif repair_schedule is not None:
+        # Sabitlenen kısım yeni verilerle uyuşmuyor (veya süre yetmedi): Bölgeyi genişlet, en sonunda tüm okulu (ipuçlu) çöz
+        if fixed_slots and repair_depth < REPAIR_MAX_DEPTH:
+            if progress_callback: progress_callback(5, "Onarım bölgesi genişletiliyor...")
+            return create_timetable(**dict(call_args, repair_depth=repair_depth + 1))
+        if progress_callback: progress_callback(5, "Onarım başarısız, tüm program yeniden çözülüyor...")
+        return create_timetable(**dict(call_args, repair_schedule=None, hint_schedule=hint_schedule))
     else:
         # --- Hata Analizi ve İpuçları ---
-        hints = []
-        
-        # 1. Temel Kapasite (Haftalık Ders Saati)
-        daily_slots = num_hours
-        if lunch_break_hour:
-            daily_slots -= 1
-        weekly_slots = daily_slots * 5
-        
-        # 2. Öğretmen Kapasite Kontrolü
-        for t in teachers:
-            t_name = str(t.get('name', '')).strip()
-            if not t_name: continue
-            
-            # Yükü Hesapla
-            t_load = 0
-            for c_name, courses in class_lessons.items():
-                for crs_name, count in courses.items():
-                    if assignments.get(c_name, {}).get(crs_name) == t_name:
-                        t_load += count
-            
-            if t_load == 0: continue
-            
-            # Kapasiteyi Hesapla
-            un_days = t.get('unavailable_days', []) or []
-            un_slots = t.get('unavailable_slots', []) or []
-            max_daily = safe_int(t.get('max_hours_per_day'), 8)
-            
-            # Çalışma günleri
-            working_days = 5 - len(un_days)
-            if working_days < 0: working_days = 0
-            
-            # Günlük limit kısıtlaması (Ders saati vs Max limit)
-            effective_daily = min(daily_slots, max_daily)
-            
-            # Toplam teorik kapasite
-            t_cap = working_days * effective_daily
-            
-            # Münferit saat kısıtlamalarını düş
-            valid_un_slots_count = 0
-            for s in un_slots:
-                if ":" in s:
-                    d_str, _ = s.split(":", 1)
-                    if d_str not in un_days:
-                        valid_un_slots_count += 1
-            t_cap -= valid_un_slots_count
-            
-
-            if t_load > t_cap:
-                details = f"Gün: {working_days}, Günlük Limit: {effective_daily}"
-                
-                # Çözüm Önerileri Oluştur
-                suggestions = []
-                if working_days < 5: suggestions.append("İzin gününü kaldır")
-                if effective_daily < daily_slots: suggestions.append("Günlük limiti artır")
-                # if duty_deduction > 0: suggestions.append("Nöbeti kaldır")
-                if valid_un_slots_count > 0: suggestions.append("Kısıtlı saatleri aç")
-                
-                suggestion_text = " | ".join(suggestions) if suggestions else "Ders yükünü azalt"
-
-                if valid_un_slots_count > 0: details += f", Kısıtlı Saat: {valid_un_slots_count}"
-                hints.append(f"🔴 {t_name}: Atanan {t_load} > Müsait {t_cap} ({details})\n   💡 ÖNERİ: {suggestion_text}")
-
-        # 3. Sınıf Yükü Kontrolü
-        for c_name, courses in class_lessons.items():
-            c_load = sum(courses.values())
-            if c_load > weekly_slots:
-                hints.append(f"🔴 Sınıf {c_name}: Ders Yükü {c_load} > Haftalık Kapasite {weekly_slots}\n   💡 ÖNERİ: Ders saatlerini azaltın veya günlük ders saati sayısını artırın.")
+        hints = feasibility_precheck(problem, mode, simultaneous_lessons)
 
         msg = "Çözüm Bulunamadı. Kısıtlamaları gevşetin."
         if hints:
             msg += "\n\n🔍 Olası Sorunlar:\n" + "\n".join(hints)
             
         return [], msg, []
+
+
+class QueueReporter:
+    """
+    Alt süreçteki ilerleme/ara çözüm bildirimlerini ana sürece kuyrukla iletir (süreçler arası taşınabilir).
+    Ara çözümün programı (info["schedule"]) alt süreçte hesaplanıp liste olarak gönderilir.
+    """
+
+    def __init__(self, channel, index, kind):
+        self.channel = channel
+        self.index = index
+        self.kind = kind
+
+    def __call__(self, *args):
+        if self.kind == "incumbent":
+            info = dict(args[0], schedule=args[0]["schedule"]())
+            self.channel.put((self.index, "incumbent", info))
+        else:
+            self.channel.put((self.index, "progress", args))
+
+
+def solve_component(kwargs):
+    """Süreç havuzunda tek bir bölümü çözer."""
+    return create_timetable(**kwargs)
+
+
+def resolved_profile(profile, draft=False):
+    """Profil adının veya ayar sözlüğünün tam hali (eksik alanlar varsayılan profilden alınır)."""
+    if profile is None:
+        profile = "draft" if draft else DEFAULT_SOLVER_PROFILE
+    settings = dict(SOLVER_PROFILES[DEFAULT_SOLVER_PROFILE])
+    settings.update(profile if isinstance(profile, dict) else SOLVER_PROFILES.get(profile, {}))
+    return settings
+
+
+def component_args(call_args, class_names, problem, workers):
+    """Bölümün create_timetable argümanları: Sadece bölümün sınıfları, öğretmenleri ve (derslik modunda) derslikleri."""
+    mode = call_args["mode"]
+    classes = set(class_names)
+    rows = [a for a, (c_id, _, _, _) in enumerate(problem.lessons) if problem.class_names[c_id] in classes]
+    teacher_names = {problem.teacher_names[problem.lessons[a][2]] for a in rows}
+    rooms = call_args["rooms"]
+    if mode == "room" and rooms:
+        eligibility = problem.eligibility(mode)
+        used = set()
+        for a in rows:
+            _, crs_id, t_id, _ = problem.lessons[a]
+            used.update(eligibility.allowed_rooms(problem.course_names[crs_id], problem.teacher_names[t_id]))
+        rooms = [r for r in rooms if r in used]
+
+    def own(items):
+        if items is None: return None
+        return [it for it in items if isinstance(it, dict) and it.get("Sınıf") in classes]
+
+    settings = resolved_profile(call_args["solver_profile"], call_args["draft"])
+    settings["workers"] = workers
+
+    return dict(
+        call_args,
+        teachers=[t for t in call_args["teachers"] or [] if str(t.get("name", "")).strip() in teacher_names],
+        classes=[c for c in call_args["classes"] or [] if c in classes],
+        class_lessons={c: v for c, v in (call_args["class_lessons"] or {}).items() if c in classes},
+        assignments={c: v for c, v in (call_args["assignments"] or {}).items() if c in classes},
+        rooms=rooms,
+        simultaneous_lessons={c: v for c, v in (call_args["simultaneous_lessons"] or {}).items() if c in classes},
+        hint_schedule=own(call_args["hint_schedule"]),
+        repair_schedule=own(call_args["repair_schedule"]),
+        pinned_lessons=own(call_args["pinned_lessons"]),
+        problem=None, decompose=False, precheck=False, portfolio=1, solver_profile=settings,
+        progress_callback=None, incumbent_callback=None, stop_event=None,
+    )
+
+
+def result_header(call_args):
+    """Birleştirilmiş sonuçların (bölümler, seviyeler, portföy) mesaj başlığı."""
+    stop_event = call_args["stop_event"]
+    if stop_event is not None and stop_event.is_set():
+        return "Arama durduruldu, bulunan en iyi program kullanıldı."
+    if call_args["draft"]:
+        return "Taslak Program Hazır (Sadece zorunlu kurallar, tercihler gözetilmedi)."
+    return "Çözüm Bulundu!"
+
+
+def complete_result(result):
+    """create_timetable sonucu başarılı ve tam mı (program boş değil, atanamayan ders saati yok)."""
+    schedule, _, violations = result
+    return bool(schedule) and not any(v.startswith("Ders Atanamadı") for v in violations)
+
+
+def run_in_processes(call_args, jobs, labels, on_incumbent=None, stop_on_first=False):
+    """
+    create_timetable argüman sözlüklerini (jobs) ayrı süreçlerde aynı anda çözer, sonuçları sırayla döner.
+    İlerleme "<etiket>: <mesaj>" olarak, ara çözümler on_incumbent(sıra, bilgi) ile ana süreçte işlenir
+    (True dönerse tüm süreçler durdurulur). Çağıranın durdurma isteği (stop_event) tüm süreçlere iletilir.
+    stop_on_first: Tüm dersleri yerleştirerek biten ilk süreç (optimum / boşluk limiti) diğerlerini durdurur.
+    Hata veren süreç başarısız (boş program) sayılır.
+    """
+    progress_callback = call_args["progress_callback"]
+    stop_event = call_args["stop_event"]
+    n = len(jobs)
+    context = multiprocessing.get_context("spawn")
+    with context.Manager() as manager, ProcessPoolExecutor(max_workers=n, mp_context=context) as pool:
+        channel = manager.Queue()
+        shared_stop = manager.Event()
+        futures = []
+        for k, kwargs in enumerate(jobs):
+            kwargs = dict(kwargs, stop_event=shared_stop)
+            if progress_callback:
+                kwargs["progress_callback"] = QueueReporter(channel, k, "progress")
+            if on_incumbent:
+                kwargs["incumbent_callback"] = QueueReporter(channel, k, "incumbent")
+            futures.append(pool.submit(solve_component, kwargs))
+
+        def collect(k):
+            # Süreçte oluşan hata (ör. bellek yetmezliği) o çözümü başarısız sayar, diğer sonuçlar korunur
+            try:
+                return futures[k].result()
+            except Exception as exc:
+                return [], f"{labels[k]}: Süreç hata verdi ({type(exc).__name__}: {exc}).", []
+
+        results = [None] * n
+        percents = [0] * n
+        while True:
+            for k, f in enumerate(futures):
+                if results[k] is None and f.done():
+                    results[k] = collect(k)
+                    if stop_on_first and complete_result(results[k]):
+                        shared_stop.set()
+            running = any(result is None for result in results)
+            if stop_event is not None and stop_event.is_set():
+                shared_stop.set()
+            try:
+                k, kind, payload = channel.get(timeout=0.2)
+            except queue.Empty:
+                if running: continue
+                break
+            if kind == "progress" and progress_callback:
+                percents[k] = payload[0]
+                progress_callback(min(sum(percents) // n, 95), f"{labels[k]}: {payload[1]}")
+            elif kind == "incumbent" and on_incumbent(k, payload):
+                shared_stop.set()
+        return [result if result is not None else collect(k) for k, result in enumerate(results)]
+
+
+def solve_components(call_args, components, problem):
+    """
+    Bağımsız bölümleri süreç havuzunda aynı anda çözer ve sonuçları birleştirir.
+    Her bölüm çekirdeklerin eşit payını (en az bir çekirdek, bölüm sayısı çekirdek sayısını aşmaz) kullanır. İlerleme ve ara çözümler
+    kuyrukla ana sürece iletilir; ara çözümler bölümlerin son çözümleri toplanarak bildirilir. Durdurma isteği
+    tüm bölümlere iletilir. Sınıf modunda derslikler birleşik program üzerinde yeniden dağıtılır (çakışma olmasın diye).
+    """
+    progress_callback = call_args["progress_callback"]
+    incumbent_callback = call_args["incumbent_callback"]
+    stop_event = call_args["stop_event"]
+    n = len(components)
+    if progress_callback: progress_callback(10, f"Okul {n} bağımsız bölüme ayrıldı, bölümler paralel çözülüyor...")
+    workers = max(1, available_cpu_count() // n)
+
+    latest = {} # bölüm -> son ara çözüm
+
+    def merge_incumbents(k, info):
+        latest[k] = info
+        parts = list(latest.values())
+        incumbent_callback({
+            "solution": sum(p["solution"] for p in parts),
+            "time": max(p["time"] for p in parts),
+            "objective": sum(p["objective"] for p in parts),
+            "bound": sum(p["bound"] for p in parts),
+            "missing_hours": sum(p["missing_hours"] for p in parts),
+            "violations": sum(p["violations"] for p in parts),
+            "schedule": lambda parts=parts: [item for p in parts for item in p["schedule"]],
+        })
+
+    jobs = [component_args(call_args, class_names, problem, workers) for class_names in components]
+    labels = [f"Bölüm {k + 1}/{n}" for k in range(n)]
+    results = run_in_processes(call_args, jobs, labels, on_incumbent=merge_incumbents if incumbent_callback else None)
+
+    schedule, violations, notes = [], [], []
+    for k, (class_names, (part_schedule, part_msg, part_violations)) in enumerate(zip(components, results)):
+        schedule.extend(part_schedule)
+        violations.extend(part_violations)
+        notes.append(f"Bölüm {k + 1} ({', '.join(class_names)}): {part_msg}")
+    if not schedule:
+        return [], f"{n} bağımsız bölümün hiçbirinde çözüm bulunamadı.\n\n" + "\n\n".join(notes), []
+    if call_args["mode"] != "room":
+        schedule = assign_rooms(schedule, problem.eligibility(call_args["mode"]), call_args["room_capacities"], previous=schedule)
+    header = result_header(call_args)
+    msg = f"{header} ({n} bağımsız bölüm paralel çözüldü)\n\n" + "\n\n".join(notes)
+    return schedule, msg, violations
+
+
+PORTFOLIO_RUN_WORKERS = 8 # Otomatik portföyde süreç başına çekirdek (portfolio="auto")
+# Portföy süreçlerinin farklılaştırılması: Çözücü ayarları (seed, branching) ve create_timetable formülasyon
+# seçenekleri. "mode" verilen varyant sadece o modda kullanılır. Süreç sayısı varyanttan fazlaysa başa dönülür
+# (her süreç ayrıca kendi tohumunu alır).
+PORTFOLIO_VARIANTS = [
+    {"label": "Varsayılan"},
+    {"label": "Hızlı yeniden başlatma", "branching": "quick_restart"},
+    {"label": "Blok başlangıç modeli", "block_model": "interval"},
+    {"label": "İki aşamalı derslik modeli", "room_engine": "two_phase", "mode": "room"},
+    {"label": "LP güdümlü arama", "branching": "lp"},
+    {"label": "Blok aralık kısıtları", "block_model": "interval", "block_no_overlap": True},
+    {"label": "Sözde maliyet araması", "branching": "pseudo_cost"},
+    {"label": "Simetri kırmasız", "symmetry_breaking": False},
+]
+PORTFOLIO_SOLVER_KEYS = ("seed", "branching")
+
+
+def solve_portfolio(call_args, problem, runs):
+    """
+    Süreç portföyü: Aynı okul runs kadar süreçte farklı tohum, dallanma stratejisi ve formülasyonla çözülür.
+    Süreçler çekirdeklerin eşit payını (en az bir iş parçacığı) kullanır. Tüm ders saatlerini
+    yerleştirerek biten ilk süreç (optimum veya boşluk limiti kanıtlandı) ya da portfolio_target hedefine ulaşan ilk ara çözüm
+    diğer süreçleri durdurur. En çok ders saati yerleşen (eşitlikte en az ihlalli) program seçilir.
+    Ara çözümlerden sadece o ana kadarkinden iyi olanlar bildirilir.
+    """
+    progress_callback = call_args["progress_callback"]
+    incumbent_callback = call_args["incumbent_callback"]
+    target = call_args["portfolio_target"]
+    if progress_callback: progress_callback(10, f"Çözüm {runs} süreçte farklı stratejilerle aranıyor (portföy)...")
+    settings = resolved_profile(call_args["solver_profile"], call_args["draft"])
+    settings["workers"] = max(1, available_cpu_count() // runs)
+    variants = [v for v in PORTFOLIO_VARIANTS if v.get("mode", call_args["mode"]) == call_args["mode"]]
+
+    jobs, labels = [], []
+    for k in range(runs):
+        variant = variants[k % len(variants)]
+        profile = dict(settings, seed=k)
+        profile.update({key: variant[key] for key in PORTFOLIO_SOLVER_KEYS if key in variant})
+        options = {key: value for key, value in variant.items() if key not in PORTFOLIO_SOLVER_KEYS + ("label", "mode")}
+        jobs.append(dict(
+            call_args, **options, solver_profile=profile, problem=None, decompose=False, precheck=False,
+            hierarchical=False, portfolio=1, progress_callback=None, incumbent_callback=None, stop_event=None,
+        ))
+        labels.append(f"Süreç {k + 1}/{runs} ({variant['label']})")
+
+    best_seen = [None] # (eksik saat, ihlal) -> en iyi ara çözüm
+
+    def on_incumbent(k, info):
+        key = (info["missing_hours"], info["violations"])
+        if best_seen[0] is None or key < best_seen[0]:
+            best_seen[0] = key
+            if incumbent_callback:
+                incumbent_callback(dict(info, schedule=lambda items=info["schedule"]: items))
+        return target is not None and key[0] == 0 and key[1] <= target
+
+    watch = incumbent_callback is not None or target is not None
+    results = run_in_processes(call_args, jobs, labels, on_incumbent=on_incumbent if watch else None, stop_on_first=True)
+
+    best = max(range(runs), key=lambda k: (len(results[k][0]), -len(results[k][2]), -k))
+    schedule, best_msg, violations = results[best]
+    if not schedule:
+        return [], f"{runs} süreçlik portföyde çözüm bulunamadı.\n\n{best_msg}", []
+    msg = f"{result_header(call_args)} (Portföy: {runs} süreç, en iyi: {labels[best]})"
+    details = best_msg.split("\n\n", 1)[1:] # Aşama raporu vb.
+    if details:
+        msg += "\n\n" + details[0]
+    return schedule, msg, violations
+
+
+HIERARCHICAL_MIN_CLASSES = 80 # Bu kadar ve daha fazla sınıfı olan okullar seviye seviye çözülür (hierarchical=None)
+HIERARCHICAL_POLISH_SHARE = 0.25 # Süre limitinin seviye sınırlarını iyileştirmeye ayrılan payı
+
+
+def class_grade(c_name):
+    """Sınıf adından seviye: Baştaki sayı ("10-A" -> "10"), yoksa ilk ayraçtan önceki kısım ("Hazırlık-B" -> "hazırlık")."""
+    name = str(c_name).strip()
+    match = re.match(r"\d+", name)
+    if match:
+        return match.group()
+    return re.split(r"[-/\s]", name, maxsplit=1)[0].casefold()
+
+
+def grade_levels(problem, grade_groups=None):
+    """
+    Sınıf seviyeleri [(seviye adı, [sınıflar]), ...]. Haftalık ders saati en fazla olan seviye önce gelir
+    (en zor kısım boş programa yerleşir). grade_groups: sınıf -> seviye adı (verilmeyenler için class_grade).
+    """
+    grade_groups = grade_groups or {}
+    label_of = {c_name: str(grade_groups.get(c_name) or class_grade(c_name)) for c_name in problem.class_names}
+    members, load = defaultdict(list), defaultdict(int)
+    for c_name in problem.class_names:
+        members[label_of[c_name]].append(c_name)
+    for c_id, _, _, count in problem.lessons:
+        load[label_of[problem.class_names[c_id]]] += count
+    return sorted(members.items(), key=lambda item: -load[item[0]])
+
+
+def reserve_teacher_slots(teachers, items, problem):
+    """
+    Öğretmen listesinin kopyası: items kayıtlarının (sınıf, ders) öğretmeni o saatte kapalı sayılır.
+    Listede olmayan öğretmenler için sadece kapalı saatleri olan bir kayıt eklenir (günlük limit: tüm gün).
+    """
+    busy = defaultdict(list)
+    for item in items:
+        a = problem.lesson_index.get((item.get("Sınıf"), item.get("Ders")))
+        if a is None: continue
+        busy[problem.teacher_names[problem.lessons[a][2]]].append(f"{item.get('Gün')}:{item.get('Saat')}")
+    result = []
+    for t in teachers or []:
+        name = str(t.get("name", "")).strip() if t else ""
+        if name in busy:
+            t = dict(t, unavailable_slots=list(t.get("unavailable_slots") or []) + busy.pop(name))
+        result.append(t)
+    for name, slots in busy.items():
+        result.append({"name": name, "max_hours_per_day": problem.num_hours, "unavailable_slots": slots})
+    return result
+
+
+def solve_by_grades(call_args, levels, problem):
+    """
+    Seviye seviye (hiyerarşik) çözüm. Her adımda bir sonraki seviyenin sınıfları modele eklenir ve onarım modunda
+    çözülür: Önceki seviyelerin yerleşimleri sabittir (sadece sabit saat değişkenleri açılır), böylece öğretmen ve
+    derslik saatleri dolu sayılır. Sonraki seviyelerin sabitlenmiş dersleri öğretmen kapalı saati olarak ayrılır.
+    Son olarak komşu seviye çiftleri (sınırlar) birlikte yeniden çözülür; daha iyi sonuç kabul edilir.
+    Süre limiti seviyelere ders saatleriyle orantılı, sınırlara HIERARCHICAL_POLISH_SHARE payıyla dağıtılır.
+    """
+    progress_callback = call_args["progress_callback"]
+    stop_event = call_args["stop_event"]
+    settings = resolved_profile(call_args["solver_profile"], call_args["draft"])
+    total_time = float(settings["time_limit"])
+    level_hours = []
+    for _, names in levels:
+        names = set(names)
+        level_hours.append(sum(count for c_id, _, _, count in problem.lessons if problem.class_names[c_id] in names))
+    windows = len(levels) - 1
+    step_times = [max(total_time * (1 - HIERARCHICAL_POLISH_SHARE) * h / max(sum(level_hours), 1), 1.0) for h in level_hours]
+    step_times += [max(total_time * HIERARCHICAL_POLISH_SHARE / windows, 1.0)] * windows
+    pinned = [it for it in call_args["pinned_lessons"] or [] if isinstance(it, dict)]
+    hint = [it for it in call_args["hint_schedule"] or [] if isinstance(it, dict)]
+
+    schedule, violations, note = [], [], None
+    placed_levels = 0
+    for i, time_limit in enumerate(step_times):
+        if stop_event is not None and stop_event.is_set(): break
+        if i < len(levels):
+            scope = [c_name for _, names in levels[:i + 1] for c_name in names]
+            free = levels[i][1]
+            title = f"Seviye {i + 1}/{len(levels)} ({levels[i][0]})"
+        else:
+            j = i - len(levels)
+            scope = list(problem.class_names)
+            free = levels[j][1] + levels[j + 1][1]
+            title = f"Sınır İyileştirme {j + 1}/{windows} ({levels[j][0]} - {levels[j + 1][0]})"
+        in_scope, is_free = set(scope), set(free)
+
+        kwargs = component_args(call_args, scope, problem, settings.get("workers"))
+        kwargs["solver_profile"]["time_limit"] = time_limit
+        later_pins = [it for it in pinned if it.get("Sınıf") not in in_scope]
+        if later_pins:
+            kwargs["teachers"] = reserve_teacher_slots(kwargs["teachers"], later_pins, problem)
+        level_hint = [it for it in hint if it.get("Sınıf") in is_free] if i < len(levels) else []
+        kwargs.update(
+            repair_schedule=schedule or None, repair_classes=free, repair_depth=0, repair_time_limit=time_limit,
+            hint_schedule=schedule + level_hint if level_hint else None, hierarchical=False,
+            stop_event=stop_event, incumbent_callback=call_args["incumbent_callback"],
+        )
+        if progress_callback:
+            kwargs["progress_callback"] = lambda percent, text, i=i, title=title: progress_callback(
+                min((i * 100 + percent) // len(step_times), 95), f"{title}: {text}"
+            )
+        step_schedule, step_msg, step_violations = create_timetable(**kwargs)
+
+        if i < len(levels):
+            if not step_schedule:
+                note = f"{title}: {step_msg}"
+                break
+            placed_levels = i + 1
+        elif (len(step_schedule), -len(step_violations)) <= (len(schedule), -len(violations)):
+            continue # Sınır iyileştirmesi daha iyi bir program bulamadı
+        schedule, violations = step_schedule, step_violations
+
+    stopped = stop_event is not None and stop_event.is_set()
+    if not schedule:
+        if stopped:
+            return [], "Arama durduruldu (henüz bir çözüm bulunamamıştı).", []
+        return [], f"Seviye seviye çözüm başarısız oldu.\n\n{note}", []
+    header = result_header(call_args)
+    order = " → ".join(label for label, _ in levels)
+    msg = f"{header} (Seviye seviye çözüldü: {order}; {placed_levels}/{len(levels)} seviye yerleşti)"
+    if note:
+        msg += f"\n\n{note}"
+    return schedule, msg, violations
+
+
+EXPLAIN_TIME_LIMIT = 30.0 # Açıklama modunun toplam süre limiti (sn)
+EXPLAIN_CHECK_LIMIT = 5.0 # Çekirdek küçültmede her denemenin süre limiti (sn)
+
+
+def explain_infeasibility(problem, mode="class", simultaneous_lessons=None, time_limit=EXPLAIN_TIME_LIMIT, progress_callback=None):
+    """
+    Açıklama modu: Tüm derslerin tam yerleşmesini zorunlu kılan ayrı bir model kurar. Her kural ailesi varlık
+    başına bir varsayım (assumption) değişkeniyle korunur:
+      - "Ders Yükü: <öğretmen>": Öğretmenin tüm dersleri haftalık saatlerinin tamamıyla yerleşir
+      - "İzin/Kısıtlı Saat: <öğretmen>", "Öğretmen Günlük Limit: <öğretmen>"
+      - "Ders Günlük Limit: <ders>", "Blok Süresi: <ders>", "Tek Parça (Süreklilik): <ders>"
+      - "Öğle Arası", derslik modunda "Derslik Grubu: <derslikler>" ve "Uygun Derslik: <ders>"
+    Çakışmalar (öğretmen/sınıf aynı saatte tek ders) korunmaz, her zaman geçerlidir.
+    Model çözülemezse SufficientAssumptionsForInfeasibility çakışan varsayımları verir; küme, parçaları ve sonra
+    tek tek elemanları çıkarılıp tekrar denenerek (süre limiti içinde) küçültülür. Denemelerde varsayımlar
+    sabitlenir, böylece presolve kapalı kuralları modelden atar ve her deneme kısa sürer.
+    Dönüş: (çakışan kural adları, mesaj)
+    """
+    if progress_callback: progress_callback(5, "Açıklama modeli kuruluyor...")
+    days = problem.days
+    model = cp_model.CpModel()
+    assumptions = {} # kural adı -> varsayım değişkeni
+
+    def guard(label):
+        if label not in assumptions:
+            assumptions[label] = model.NewBoolVar(label)
+        return assumptions[label]
+
+    # x[a][d_idx][h]: Ders o saatte yapılıyor mu? (Kapalı saatler dahil, kurallar varsayımlarla kapatılır)
+    # Eş zamanlı grup üyeleri liderin değişkenlerini paylaşır.
+    x = [[{h: model.NewBoolVar("") for h in problem.hours} for _ in days] for _ in problem.lessons]
+    followers = set()
+    for group in simultaneous_groups(problem, simultaneous_lessons):
+        for a in group[1:]:
+            x[a] = x[group[0]]
+            followers.add(a)
+    by_teacher, by_class = defaultdict(list), defaultdict(list)
+    for a, (c_id, crs_id, t_id, count) in enumerate(problem.lessons):
+        by_teacher[t_id].append(a)
+        if a not in followers:
+            by_class[c_id].append(a)
+
+    for a, (c_id, crs_id, t_id, count) in enumerate(problem.lessons):
+        t_name = problem.teacher_names[t_id]
+        crs_name = problem.course_names[crs_id]
+        all_vars = [v for day in x[a] for v in day.values()]
+        model.Add(cp_model.LinearExpr.Sum(all_vars) == count).OnlyEnforceIf(guard(f"Ders Yükü: {t_name}"))
+
+        blocked = [x[a][d_idx][h] for d_idx in range(len(days)) for h in problem.hours if problem.is_blocked(t_id, d_idx, h)]
+        if blocked:
+            model.AddBoolAnd([v.Not() for v in blocked]).OnlyEnforceIf(guard(f"İzin/Kısıtlı Saat: {t_name}"))
+        if problem.lunch_break_hour in problem.hours:
+            model.AddBoolAnd([day[problem.lunch_break_hour].Not() for day in x[a]]).OnlyEnforceIf(guard("Öğle Arası"))
+
+        blk = problem.course_block_size[crs_id]
+        limit = max(problem.course_max_daily[crs_id], blk)
+        allowed = block_durations(problem, crs_id, count)
+        for day in x[a]:
+            daily = cp_model.LinearExpr.Sum(list(day.values()))
+            model.Add(daily <= limit).OnlyEnforceIf(guard(f"Ders Günlük Limit: {crs_name}"))
+            if blk > 1:
+                model.AddLinearExpressionInDomain(daily, cp_model.Domain.FromValues(allowed)).OnlyEnforceIf(guard(f"Blok Süresi: {crs_name}"))
+            starts = [day[1]]
+            for h in problem.hours[1:]:
+                start = model.NewBoolVar("")
+                model.Add(start >= day[h] - day[h - 1])
+                starts.append(start)
+            model.Add(cp_model.LinearExpr.Sum(starts) <= 1).OnlyEnforceIf(guard(f"Tek Parça (Süreklilik): {crs_name}"))
+
+    # Çakışmalar (Korunmaz)
+    for d_idx in range(len(days)):
+        for h in problem.hours:
+            for rows in list(by_teacher.values()) + list(by_class.values()):
+                if len(rows) > 1:
+                    model.AddAtMostOne([x[a][d_idx][h] for a in rows])
+
+    for t_id, rows in by_teacher.items():
+        if not problem.teacher_known[t_id]: continue
+        limit = problem.teacher_max_daily[t_id]
+        for d_idx in range(len(days)):
+            daily = [x[a][d_idx][h] for a in rows for h in problem.hours]
+            if len(daily) > limit:
+                model.Add(cp_model.LinearExpr.Sum(daily) <= limit).OnlyEnforceIf(guard(f"Öğretmen Günlük Limit: {problem.teacher_names[t_id]}"))
+
+    # Derslik modunda: Her saatte aynı derslik grubuna sığmak zorunda olan derslerin sayısı <= grup kapasitesi
+    if mode == "room":
+        eligibility = problem.eligibility(mode)
+        capacities = dict(zip(problem.room_names, problem.room_capacity))
+        lesson_masks = {}
+        for a, (c_id, crs_id, t_id, count) in enumerate(problem.lessons):
+            m = eligibility.mask(problem.course_names[crs_id], problem.teacher_names[t_id])
+            if m:
+                lesson_masks[a] = m
+            else:
+                model.AddBoolAnd([v.Not() for day in x[a] for v in day.values()]).OnlyEnforceIf(guard(f"Uygun Derslik: {problem.course_names[crs_id]}"))
+        for group_mask, group_cap, group_rows in eligibility_groups(eligibility, capacities, lesson_masks):
+            if len(group_rows) <= group_cap: continue
+            lit = guard("Derslik Grubu: " + ", ".join(r for i, r in enumerate(eligibility.rooms) if group_mask >> i & 1))
+            for d_idx in range(len(days)):
+                for h in problem.hours:
+                    model.Add(cp_model.LinearExpr.Sum([x[a][d_idx][h] for a in group_rows]) <= group_cap).OnlyEnforceIf(lit)
+
+    labels = list(assumptions)
+    deadline = time.perf_counter() + time_limit
+
+    def new_solver(limit):
+        solver = cp_model.CpSolver()
+        solver.parameters.max_time_in_seconds = max(0.1, min(limit, deadline - time.perf_counter()))
+        set_search_workers(solver)
+        return solver
+
+    def check(active, limit):
+        """Sadece verilen kurallar açıkken modeli dener. Varsayımlar sabitlenir (presolve modeli sadeleştirir)."""
+        trial = model.Clone()
+        trial.ClearAssumptions()
+        for label, lit in assumptions.items():
+            trial.Add(trial.GetBoolVarFromProtoIndex(lit.Index()) == int(label in active))
+        return new_solver(limit).Solve(trial)
+
+    if progress_callback: progress_callback(20, "Tüm kurallar birlikte deneniyor...")
+    status = check(labels, time_limit)
+    if status in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+        return [], "Tüm kesin ve günlük limit kuralları birlikte sağlanabiliyor. Sorun süre limitinden veya yumuşak kurallardan (tercih, günlük minimum, denge) kaynaklanıyor."
+    if status != cp_model.INFEASIBLE:
+        return [], "Süre limiti içinde çakışma bulunamadı. Süre limitini artırıp tekrar deneyin."
+
+    # Varsayımlarla çözüm: Çakışmaya yeten varsayım kümesi (bulunamazsa tüm kurallardan başlanır)
+    if progress_callback: progress_callback(35, "Çakışan kurallar aranıyor...")
+    model.AddAssumptions([assumptions[label] for label in labels])
+    solver = new_solver(EXPLAIN_CHECK_LIMIT)
+    core = labels
+    if solver.Solve(model) == cp_model.INFEASIBLE:
+        core_index = set(solver.SufficientAssumptionsForInfeasibility())
+        core = [label for label in labels if assumptions[label].Index() in core_index] or labels
+
+    # Çekirdeği küçült: Çıkarıldığında çakışma süren kurallar gerekli değildir.
+    # Önce büyük parçalar, sonra tek tek kurallar denenir.
+    if progress_callback: progress_callback(50, f"Çakışan {len(core)} kural küçültülüyor...")
+    chunk = max(1, len(core) // 2)
+    timed_out = False
+    while chunk >= 1 and not timed_out:
+        i = 0
+        while i < len(core):
+            if time.perf_counter() >= deadline:
+                timed_out = True
+                break
+            rest = core[:i] + core[i + chunk:]
+            if rest and check(rest, EXPLAIN_CHECK_LIMIT) == cp_model.INFEASIBLE:
+                core = rest
+            else:
+                i += chunk
+        chunk //= 2
+
+    msg = "Bu kurallar birlikte sağlanamıyor (en az birini gevşetin):\n" + "\n".join(f"🔴 {label}" for label in core)
+    if timed_out:
+        msg += "\n(Süre limiti doldu, liste daha da küçültülebilir.)"
+    return core, msg